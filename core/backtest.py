@@ -0,0 +1,201 @@
+"""
+Vectorized backtester
+Replays stored M1 candles (core/candle_file.py) through the rule set of
+evaluate_signal (core/signal_rules.py) and reports how the signals would
+have settled, per asset and per entry hour (WAT).
+
+All assets are stacked into one symbols x bars array (rows padded with NaN
+at the end), so indicators and rules are evaluated for the whole universe
+and the whole history at once.
+
+Replay model, matching the live universe scan (evaluate_signal with
+closed=True):
+- the decision for bar t uses indicators up to and including bar t, and
+  M5 confirmation from M5 buckets built out of those M1 bars (the current
+  bucket still forming, as resample_series does);
+- the live scan runs just after bar t closes and schedule_alerts enters at
+  the following candle open, i.e. bar t + ENTRY_DELAY_BARS;
+- the trade expires at that bar's close: WIN if price moved in the signal
+  direction, LOSS if against, DRAW if unchanged. Entries that would land in
+  a data gap (market closed) are skipped.
+
+Confidence is not modelled: every signal the rules fire clears the live
+60% gate. Live cadence (top-N per candle, post-signal gaps) is not applied
+either, so this measures the rules, not the broadcast schedule.
+
+Usage: python -m core.backtest [--dir data/candles] [--interval 1min] [ASSET ...]
+"""
+
+import argparse
+import os
+
+import numpy as np
+
+from core import signal_rules as rules
+from core.candle_file import CandleReader, candle_path
+from core.vector_indicators import ema_np, rsi_np, macd_np, atr_np, psar_np
+
+ENTRY_DELAY_BARS = 2
+WAT_OFFSET = 3600
+M5_SECONDS = 300
+
+
+def load_candles(root, assets=None, interval="1min"):
+    """{asset: columns} from the candle files under `root`."""
+    if assets is None:
+        folder = os.path.join(root, interval)
+        assets = sorted(f[:-len(".candles")] for f in os.listdir(folder) if f.endswith(".candles"))
+    out = {}
+    for asset in assets:
+        path = candle_path(root, asset, interval)
+        if os.path.exists(path):
+            out[asset] = CandleReader(path).columns()
+    return out
+
+
+def _stack(columns, field, dtype, fill):
+    n = max(len(c[field]) for c in columns)
+    arr = np.full((len(columns), n), fill, dtype=dtype)
+    for i, c in enumerate(columns):
+        arr[i, :len(c[field])] = c[field]
+    return arr
+
+
+def _shift(arr, fill=np.nan):
+    """Value of the previous bar at each position."""
+    out = np.full(arr.shape, fill)
+    out[:, 1:] = arr[:, :-1]
+    return out
+
+
+def _htf_ema_now(times, closes, lengths, period, tf_seconds=M5_SECONDS):
+    """EMA of higher-timeframe closes as seen at every M1 bar, with the
+    current bucket still forming (its close is the M1 close so far)."""
+    rows, n = closes.shape
+    k = 2.0 / (period + 1.0)
+    bucket_of = np.full((rows, n), -1, dtype=np.int64)
+    bucket_closes = []
+    for r in range(rows):
+        t = times[r, :lengths[r]]
+        b = t - t % tf_seconds
+        # a leading bucket that starts before the data is incomplete: drop it
+        first = 0 if not len(t) or t[0] == b[0] else int(np.searchsorted(b, b[0], side="right"))
+        bb = b[first:]
+        if not len(bb):
+            bucket_closes.append(np.empty(0))
+            continue
+        changes = bb[1:] != bb[:-1]
+        bucket_of[r, first:lengths[r]] = np.cumsum(np.r_[True, changes]) - 1
+        bucket_closes.append(closes[r, first:lengths[r]][np.r_[changes, True]])
+    nb = max((len(c) for c in bucket_closes), default=0)
+    stacked = np.full((rows, max(nb, 1)), np.nan)
+    for r, c in enumerate(bucket_closes):
+        stacked[r, :len(c)] = c
+    committed = ema_np(stacked, period)
+
+    out = np.full((rows, n), np.nan)
+    for r in range(rows):
+        j = bucket_of[r, :lengths[r]]
+        c = closes[r, :lengths[r]]
+        now = np.full(len(j), np.nan)
+        later = j >= period
+        now[later] = c[later] * k + committed[r, j[later] - 1] * (1 - k)
+        if len(bucket_closes[r]) >= period - 1:
+            seed = 0
+            for x in bucket_closes[r][:period - 1]:
+                seed = seed + x
+            at_seed = j == period - 1
+            now[at_seed] = (seed + c[at_seed]) / period
+        out[r, :lengths[r]] = now
+    return out
+
+
+def signals(candles):
+    """Decision (+1 BUY, -1 SELL, 0 none) for every bar of every asset."""
+    assets = list(candles)
+    cols = [candles[a] for a in assets]
+    lengths = np.array([len(c["close"]) for c in cols])
+    times = _stack(cols, "time", np.int64, -1)
+    high = _stack(cols, "high", np.float64, np.nan)
+    low = _stack(cols, "low", np.float64, np.nan)
+    close = _stack(cols, "close", np.float64, np.nan)
+
+    ema_fast = ema_np(close, rules.EMA_FAST)
+    ema_slow = ema_np(close, rules.EMA_SLOW)
+    hist = macd_np(close, rules.MACD_FAST, rules.MACD_SLOW, rules.MACD_SIGNAL)[2]
+    rsi = rsi_np(close, rules.RSI_PERIOD)
+    atr = atr_np(high, low, close, rules.ATR_PERIOD)
+    psar = psar_np(high, low, rules.PSAR_STEP, rules.PSAR_MAX)
+
+    bull, bear = rules.confluence_np(ema_fast, ema_slow, hist, _shift(hist), rsi, _shift(rsi), atr, psar, close)
+    ema5_fast = _htf_ema_now(times, close, lengths, rules.EMA_FAST)
+    ema5_slow = _htf_ema_now(times, close, lengths, rules.EMA_SLOW)
+    decision = rules.decide_np(bull, bear, rules.higher_tf_ok_np(ema5_fast, ema5_slow, bull, bear))
+    # the live engine needs this much history before it evaluates at all
+    warmup = max(rules.RSI_PERIOD + 5, rules.EMA_SLOW + 5, rules.MACD_SLOW + 5)
+    decision[:, :warmup - 1] = 0
+    decision[np.arange(times.shape[1])[np.newaxis, :] >= lengths[:, np.newaxis]] = 0
+    return assets, times, decision
+
+
+def _summary(wins, losses, draws):
+    settled = wins + losses
+    return {"signals": int(wins + losses + draws), "wins": int(wins), "losses": int(losses),
+            "draws": int(draws), "win_rate": round(100.0 * float(wins) / settled, 2) if settled else None}
+
+
+def run_backtest(candles, tf_seconds=60, entry_delay=ENTRY_DELAY_BARS):
+    assets, times, decision = signals(candles)
+    opens = _stack([candles[a] for a in assets], "open", np.float64, np.nan)
+    closes = _stack([candles[a] for a in assets], "close", np.float64, np.nan)
+    rows, n = decision.shape
+
+    r, t = np.nonzero(decision[:, :max(0, n - entry_delay)])
+    e = t + entry_delay
+    # skip entries that fall into a data gap
+    contiguous = times[r, e] == times[r, t] + entry_delay * tf_seconds
+    r, t, e = r[contiguous], t[contiguous], e[contiguous]
+    move = (closes[r, e] - opens[r, e]) * decision[r, t]
+    win, loss, draw = move > 0, move < 0, move == 0
+    hour = ((times[r, e] + WAT_OFFSET) // 3600) % 24
+
+    def counts(keys, size):
+        return (np.bincount(keys[win], minlength=size), np.bincount(keys[loss], minlength=size),
+                np.bincount(keys[draw], minlength=size))
+
+    aw, al, ad = counts(r, rows)
+    hw, hl, hd = counts(hour, 24)
+    return {
+        "total": _summary(win.sum(), loss.sum(), draw.sum()),
+        "by_asset": {a: _summary(aw[i], al[i], ad[i]) for i, a in enumerate(assets)},
+        "by_hour": {h: _summary(hw[h], hl[h], hd[h]) for h in range(24) if hw[h] + hl[h] + hd[h]},
+    }
+
+
+def _print_table(title, rows):
+    print(f"\n{title}")
+    print(f"{'':>10} {'signals':>8} {'wins':>6} {'losses':>7} {'draws':>6} {'win%':>7}")
+    for key, s in rows:
+        rate = "-" if s["win_rate"] is None else f"{s['win_rate']:.1f}"
+        print(f"{key:>10} {s['signals']:>8} {s['wins']:>6} {s['losses']:>7} {s['draws']:>6} {rate:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest the evaluate_signal rules on stored candles")
+    parser.add_argument("assets", nargs="*", help="assets to replay (default: every stored file)")
+    parser.add_argument("--dir", default=os.getenv("CANDLE_DIR", os.path.join("data", "candles")))
+    parser.add_argument("--interval", default="1min")
+    args = parser.parse_args()
+
+    candles = load_candles(args.dir, args.assets or None, args.interval)
+    if not candles:
+        print(f"No candle files under {os.path.join(args.dir, args.interval)}")
+        return
+    report = run_backtest(candles)
+    _print_table("By asset", sorted(report["by_asset"].items()))
+    _print_table("By entry hour (WAT)", [(f"{h:02d}:00", s) for h, s in sorted(report["by_hour"].items())])
+    _print_table("Total", [("all", report["total"])])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Memory-mapped candle files
+One file per (symbol, interval) holding fixed-width bar records, so a
+restarted engine can reload its history instantly and other processes
+(dashboard, backtester) can map the same files read-only.
+
+Layout: a 64-byte header (magic, interval seconds, record count) followed
+by 48-byte little-endian records (int64 epoch, float64 open, high, low,
+close, volume) in ascending time order. The writer stores the records
+before it bumps the count, so a reader never sees a half-written bar.
+"""
+
+import mmap
+import os
+import struct
+
+MAGIC = b"LXCANDL1"
+HEADER = struct.Struct("<8sqq")
+HEADER_SIZE = 64
+COUNT_OFFSET = 16
+RECORD = struct.Struct("<qddddd")
+RECORD_SIZE = RECORD.size
+GROW_RECORDS = 4096
+FIELDS = ("time", "open", "high", "low", "close", "volume")
+
+
+def candle_path(root, symbol, interval):
+    return os.path.join(root, interval, symbol.replace("/", "") + ".candles")
+
+
+class _Mapped:
+    access = mmap.ACCESS_READ
+
+    def __init__(self, path):
+        self.path = path
+        self.f = open(path, "r+b" if self.access == mmap.ACCESS_WRITE else "rb")
+        self.mm = None
+        self._map()
+        magic, self.tf_seconds, _ = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a candle file")
+
+    def _map(self):
+        self._release()
+        self.mm = mmap.mmap(self.f.fileno(), 0, access=self.access)
+
+    def _release(self):
+        if self.mm is not None:
+            try:
+                self.mm.close()
+            except BufferError:
+                # columns() views still point into it: they keep the mmap
+                # object alive and it is unmapped once the last one is freed
+                pass
+            self.mm = None
+
+    @property
+    def count(self):
+        return struct.unpack_from("<q", self.mm, COUNT_OFFSET)[0]
+
+    def _ensure_mapped(self, count):
+        if HEADER_SIZE + count * RECORD_SIZE > len(self.mm):
+            self._map()
+
+    def last_epoch(self):
+        n = self.count
+        if not n:
+            return None
+        self._ensure_mapped(n)
+        return struct.unpack_from("<q", self.mm, HEADER_SIZE + (n - 1) * RECORD_SIZE)[0]
+
+    def tail(self, n):
+        """Last n bars as a dict of lists, oldest first."""
+        count = self.count
+        self._ensure_mapped(count)
+        start = max(0, count - n)
+        raw = self.mm[HEADER_SIZE + start * RECORD_SIZE:HEADER_SIZE + count * RECORD_SIZE]
+        cols = list(zip(*RECORD.iter_unpack(raw))) or [()] * len(FIELDS)
+        return {f: list(col) for f, col in zip(FIELDS, cols)}
+
+    def columns(self):
+        """All bars as zero-copy NumPy column views (epoch int64, prices float64).
+        The views cover the bars stored at the time of the call and stay
+        valid after the file grows or is closed (they keep their mapping)."""
+        import numpy as np
+        count = self.count
+        self._ensure_mapped(count)
+        dtype = np.dtype([(f, "<i8" if f == "time" else "<f8") for f in FIELDS])
+        rec = np.frombuffer(self.mm, dtype=dtype, count=count, offset=HEADER_SIZE)
+        return {f: rec[f] for f in FIELDS}
+
+    def close(self):
+        self._release()
+        self.f.close()
+
+
+class CandleReader(_Mapped):
+    """Read-only view of a candle file another process is writing."""
+
+
+class CandleFile(_Mapped):
+    """Writer side. Only one process should write a given file."""
+    access = mmap.ACCESS_WRITE
+
+    def __init__(self, path, tf_seconds):
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(HEADER.pack(MAGIC, tf_seconds, 0).ljust(HEADER_SIZE, b"\0"))
+                f.truncate(HEADER_SIZE + GROW_RECORDS * RECORD_SIZE)
+        super().__init__(path)
+
+    def _grow(self, count):
+        need = HEADER_SIZE + count * RECORD_SIZE
+        if need > len(self.mm):
+            self.f.truncate(need + GROW_RECORDS * RECORD_SIZE)
+            self._map()
+
+    def write(self, bars):
+        """Store (epoch, open, high, low, close, volume) tuples in time order.
+        Bars older than the last stored one are ignored; a bar with the same
+        epoch overwrites it. Returns the number of bars appended."""
+        count = self.count
+        last = self.last_epoch()
+        appended = 0
+        for bar in bars:
+            if last is not None and bar[0] < last:
+                continue
+            if bar[0] == last:
+                RECORD.pack_into(self.mm, HEADER_SIZE + (count - 1) * RECORD_SIZE, *bar)
+                continue
+            self._grow(count + 1)
+            RECORD.pack_into(self.mm, HEADER_SIZE + count * RECORD_SIZE, *bar)
+            count += 1
+            appended += 1
+            last = bar[0]
+        if appended:
+            struct.pack_into("<q", self.mm, COUNT_OFFSET, count)
+        return appended
+
+    def flush(self):
+        self.mm.flush()
@@ -0,0 +1,65 @@
+"""
+Rate limiting for outgoing Telegram messages
+Telegram allows a bot about 30 messages per second overall and about one
+message per second to the same chat; over that it answers 429 with a
+retry_after. TokenBucket covers the global limit, ChatLimiter the per-chat
+one.
+
+Both work by reservation: reserve() books the next free slot and returns
+how long the caller must wait before using it. Threaded senders sleep for
+that long (acquire()), asyncio senders await asyncio.sleep() on it, so one
+implementation serves lekzy_trade_ai.py and core/trading_core.py.
+"""
+
+import threading
+import time
+
+
+class TokenBucket:
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else rate)
+        self.tokens = self.burst
+        self.last = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def reserve(self, n=1):
+        """Take n tokens; returns the seconds to wait before they may be used."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            self.tokens -= n  # may go negative: later callers queue behind this one
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            return max(wait, self.paused_until - now)
+
+    def acquire(self, n=1):
+        wait = self.reserve(n)
+        if wait > 0:
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """Hold every sender for `seconds` (Telegram's retry_after)."""
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class ChatLimiter:
+    """At most one message per `interval` seconds to each key (chat id)."""
+
+    def __init__(self, interval=1.0, max_keys=100000):
+        self.interval = interval
+        self.max_keys = max_keys
+        self.next_free = {}
+        self.lock = threading.Lock()
+
+    def reserve(self, key):
+        with self.lock:
+            now = time.monotonic()
+            if len(self.next_free) >= self.max_keys:
+                # forget chats whose slot is already free
+                self.next_free = {k: t for k, t in self.next_free.items() if t > now}
+            at = max(now, self.next_free.get(key, 0.0))
+            self.next_free[key] = at + self.interval
+            return at - now
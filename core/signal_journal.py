@@ -0,0 +1,125 @@
+"""
+Signal journal
+Every emitted signal as one row of an indexed SQLite table, keyed by its
+signal id, with the indicator snapshot in typed columns. The result is
+filled in later by an UPDATE of the same row, so statistics are plain
+SQL instead of parsing logs/signals.csv and pairing rows up.
+
+Times are epoch seconds (UTC). Writes go through the single writer of
+core/sqlite_db.py and do not wait for the commit; reads can come from any
+thread or process (the dashboard opens the same file).
+
+Indexes:
+- (asset, ts, result): per-asset history and win rate over a time range,
+  answered from the index alone
+- (result): pending signals (result IS NULL) and overall win rate
+
+result is WIN, LOSS, DRAW, or VOID when the entry candle never arrived.
+"""
+
+import logging
+import time
+
+from core.sqlite_db import Database
+
+logger = logging.getLogger("lekzy")
+
+META_COLUMNS = ("ema_fast", "ema_slow", "macd_hist", "rsi", "atr", "psar")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS signals(
+    signal_id TEXT PRIMARY KEY,
+    ts INTEGER NOT NULL,
+    asset TEXT NOT NULL,
+    direction TEXT NOT NULL,
+    confidence INTEGER,
+    confirms INTEGER,
+    price REAL,
+    analysis TEXT,
+    ema_fast REAL,
+    ema_slow REAL,
+    macd_hist REAL,
+    rsi REAL,
+    atr REAL,
+    psar REAL,
+    entry_ts INTEGER,
+    entry_price REAL,
+    exit_price REAL,
+    result TEXT,
+    result_ts INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_signals_asset_ts ON signals(asset, ts, result);
+CREATE INDEX IF NOT EXISTS idx_signals_result ON signals(result);
+"""
+
+INSERT = (f"INSERT OR IGNORE INTO signals(signal_id, ts, asset, direction, confidence, confirms, price, "
+          f"analysis, entry_ts, {', '.join(META_COLUMNS)}) VALUES({', '.join('?' * (9 + len(META_COLUMNS)))})")
+UPDATE_RESULT = ("UPDATE signals SET result=?, result_ts=?, entry_price=?, exit_price=? "
+                 "WHERE signal_id=? AND result IS NULL")
+
+
+def _log_failure(fut):
+    if fut.exception() is not None:
+        logger.warning("Signal journal write failed: %s", fut.exception())
+
+
+class SignalJournal:
+    def __init__(self, path):
+        self.db = Database(path)
+        self.db.executescript(SCHEMA)
+
+    def record_signal(self, signal_id, asset, info, ts=None, entry_ts=None):
+        """Insert a new signal (info as returned by evaluate_signal)."""
+        meta = info.get("meta") or {}
+        row = (signal_id, int(ts if ts is not None else time.time()), asset, info["signal"],
+               info.get("confidence"), info.get("confirms_count"), info.get("price"), info.get("analysis"),
+               entry_ts) + tuple(meta.get(c) for c in META_COLUMNS)
+        return self._submit(lambda conn: conn.execute(INSERT, row).rowcount)
+
+    def record_result(self, signal_id, result, entry_price=None, exit_price=None, ts=None):
+        """Set the result of a signal in place; a signal is settled only once."""
+        args = (result, int(ts if ts is not None else time.time()), entry_price, exit_price, signal_id)
+        return self._submit(lambda conn: conn.execute(UPDATE_RESULT, args).rowcount)
+
+    def _submit(self, fn):
+        fut = self.db.submit(fn)
+        fut.add_done_callback(_log_failure)
+        return fut
+
+    def get(self, signal_id):
+        return self.db.query_one("SELECT * FROM signals WHERE signal_id=?", (signal_id,))
+
+    def pending(self):
+        """Unsettled signals, oldest first, as (signal_id, asset, entry_ts, info)
+        with info rebuilt in the shape evaluate_signal returns."""
+        rows = self.db.query(f"SELECT signal_id, asset, entry_ts, direction, confidence, confirms, price, "
+                             f"analysis, {', '.join(META_COLUMNS)} FROM signals WHERE result IS NULL ORDER BY ts")
+        out = []
+        for signal_id, asset, entry_ts, direction, confidence, confirms, price, analysis, *meta in rows:
+            info = {"signal": direction, "confidence": confidence, "confirms_count": confirms, "price": price,
+                    "analysis": analysis, "meta": dict(zip(META_COLUMNS, meta))}
+            out.append((signal_id, asset, entry_ts, info))
+        return out
+
+    def win_rates(self, asset=None, since=None, until=None):
+        """{asset: {"wins", "losses", "draws", "win_rate"}} over settled signals.
+        Counts are summed per asset in index order (no sort step); rows
+        still pending count for nothing."""
+        sql = ("SELECT asset, SUM(result='WIN'), SUM(result='LOSS'), SUM(result='DRAW') "
+               "FROM signals WHERE 1")
+        args = []
+        if asset is not None:
+            sql += " AND asset=?"
+            args.append(asset)
+        if since is not None:
+            sql += " AND ts>=?"
+            args.append(int(since))
+        if until is not None:
+            sql += " AND ts<?"
+            args.append(int(until))
+        out = {}
+        for a, wins, losses, draws in self.db.query(sql + " GROUP BY asset", args):
+            settled = (wins or 0) + (losses or 0)
+            out[a] = {"wins": wins or 0, "losses": losses or 0, "draws": draws or 0,
+                      "win_rate": round(100.0 * wins / settled, 2) if settled else None}
+        return out
@@ -0,0 +1,110 @@
+"""
+Signal rule set
+The EMA/MACD/RSI/PSAR/ATR confluence rules behind evaluate_signal in
+lekzy_trade_ai.py, with their parameters, in one place so the live engine
+and the backtester (core/backtest.py) apply exactly the same logic.
+confluence() works on scalars (None = not available yet); confluence_np()
+is the same rule set over NumPy arrays (NaN = not available yet).
+"""
+
+# Indicator params
+EMA_FAST = 9
+EMA_SLOW = 21
+MACD_FAST = 12
+MACD_SLOW = 26
+MACD_SIGNAL = 9
+RSI_PERIOD = 14
+ATR_PERIOD = 14
+PSAR_STEP = 0.02
+PSAR_MAX = 0.2
+
+# Rule thresholds
+RSI_BULL_BELOW = 40
+RSI_BEAR_ABOVE = 60
+ATR_MIN_RATIO = 0.0003  # ATR / price below this fails the volatility gate
+REQUIRED_CONFIRMATIONS = 3  # configurable
+
+
+def confluence(ema_fast, ema_slow, macd_hist, macd_hist_prev, rsi, rsi_prev, atr, psar, close):
+    """Per-rule flags plus bull/bear confirmation counts for one bar."""
+    ema_bull = ema_fast and ema_slow and ema_fast > ema_slow
+    ema_bear = ema_fast and ema_slow and ema_fast < ema_slow
+    macd_bull = macd_hist is not None and macd_hist_prev is not None and macd_hist > 0 and macd_hist > macd_hist_prev
+    macd_bear = macd_hist is not None and macd_hist_prev is not None and macd_hist < 0 and macd_hist < macd_hist_prev
+    rsi_bull = rsi is not None and rsi_prev is not None and rsi < RSI_BULL_BELOW and rsi > rsi_prev
+    rsi_bear = rsi is not None and rsi_prev is not None and rsi > RSI_BEAR_ABOVE and rsi < rsi_prev
+    psar_bull = psar is not None and psar < close
+    psar_bear = psar is not None and psar > close
+
+    atr_gate = True
+    if atr and close > 0:
+        if atr / close < ATR_MIN_RATIO:
+            atr_gate = False
+
+    flags = {
+        "ema_bull": bool(ema_bull), "macd_bull": bool(macd_bull), "rsi_bull": bool(rsi_bull), "psar_bull": bool(psar_bull),
+        "ema_bear": bool(ema_bear), "macd_bear": bool(macd_bear), "rsi_bear": bool(rsi_bear), "psar_bear": bool(psar_bear),
+        "atr_gate": atr_gate,
+    }
+    bull_conf = sum([flags["ema_bull"], flags["macd_bull"], flags["rsi_bull"], flags["psar_bull"], atr_gate])
+    bear_conf = sum([flags["ema_bear"], flags["macd_bear"], flags["rsi_bear"], flags["psar_bear"], atr_gate])
+    return flags, bull_conf, bear_conf
+
+
+def higher_tf_ok(ema_fast, ema_slow, bull_conf, bear_conf):
+    """Higher-timeframe EMA filter; passes when the EMAs are not available."""
+    if ema_fast and ema_slow:
+        if bull_conf > bear_conf:
+            return ema_fast > ema_slow
+        if bear_conf > bull_conf:
+            return ema_fast < ema_slow
+    return True
+
+
+def decide(bull_conf, bear_conf, htf_ok=True):
+    if bull_conf >= REQUIRED_CONFIRMATIONS and bull_conf > bear_conf and htf_ok:
+        return "BUY"
+    if bear_conf >= REQUIRED_CONFIRMATIONS and bear_conf > bull_conf and htf_ok:
+        return "SELL"
+    return None
+
+
+def confluence_np(ema_fast, ema_slow, macd_hist, macd_hist_prev, rsi, rsi_prev, atr, psar, close):
+    """confluence() over arrays: returns (bull_conf, bear_conf) int arrays."""
+    import numpy as np
+
+    def truthy(x):
+        return (x != 0) & ~np.isnan(x)
+
+    ema_ok = truthy(ema_fast) & truthy(ema_slow)
+    ema_bull = ema_ok & (ema_fast > ema_slow)
+    ema_bear = ema_ok & (ema_fast < ema_slow)
+    macd_bull = (macd_hist > 0) & (macd_hist > macd_hist_prev)  # NaN compares False
+    macd_bear = (macd_hist < 0) & (macd_hist < macd_hist_prev)
+    rsi_bull = (rsi < RSI_BULL_BELOW) & (rsi > rsi_prev)
+    rsi_bear = (rsi > RSI_BEAR_ABOVE) & (rsi < rsi_prev)
+    psar_bull = psar < close
+    psar_bear = psar > close
+    with np.errstate(divide="ignore", invalid="ignore"):
+        atr_gate = ~(truthy(atr) & (close > 0) & (atr / close < ATR_MIN_RATIO))
+    gate = atr_gate.astype(np.int8)
+    bull_conf = ema_bull.astype(np.int8) + macd_bull + rsi_bull + psar_bull + gate
+    bear_conf = ema_bear.astype(np.int8) + macd_bear + rsi_bear + psar_bear + gate
+    return bull_conf, bear_conf
+
+
+def higher_tf_ok_np(ema_fast, ema_slow, bull_conf, bear_conf):
+    import numpy as np
+    available = (ema_fast != 0) & (ema_slow != 0) & ~np.isnan(ema_fast) & ~np.isnan(ema_slow)
+    ok = np.ones(bull_conf.shape, dtype=bool)
+    ok = np.where(available & (bull_conf > bear_conf), ema_fast > ema_slow, ok)
+    ok = np.where(available & (bear_conf > bull_conf), ema_fast < ema_slow, ok)
+    return ok
+
+
+def decide_np(bull_conf, bear_conf, htf_ok):
+    """+1 for BUY, -1 for SELL, 0 for no signal."""
+    import numpy as np
+    buy = (bull_conf >= REQUIRED_CONFIRMATIONS) & (bull_conf > bear_conf) & htf_ok
+    sell = (bear_conf >= REQUIRED_CONFIRMATIONS) & (bear_conf > bull_conf) & htf_ok
+    return buy.astype(np.int8) - sell.astype(np.int8)
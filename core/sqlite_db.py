@@ -0,0 +1,107 @@
+"""
+SQLite access layer
+One Database per file, shared by every thread of the process (Telegram
+handlers, the signal engine, Flask).
+
+- Reads run on a persistent connection per thread, so there is no
+  connect() per call, and sqlite3's statement cache keeps the prepared
+  statements between calls.
+- All writes are serialized through one writer thread that owns the only
+  writing connection, so writers never contend for the lock.
+- The file is in WAL mode: readers see the last committed state and are
+  never blocked by the writer, so they do not get "database is locked".
+"""
+
+import logging
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future
+
+logger = logging.getLogger("lekzy")
+
+STATEMENT_CACHE = 128
+BUSY_TIMEOUT_MS = 5000
+
+
+class Database:
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+        self.writes = queue.Queue()
+        self.writer = None
+        self.lock = threading.Lock()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000,
+                               cached_statements=STATEMENT_CACHE, check_same_thread=False)
+        conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        return conn
+
+    def _reader(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            self._start_writer()  # makes sure the file is in WAL mode first
+            conn = self.local.conn = self._connect()
+            conn.execute("PRAGMA query_only=ON")
+        return conn
+
+    def _start_writer(self):
+        with self.lock:
+            if self.writer is not None:
+                return
+            ready = Future()
+            self.writer = threading.Thread(target=self._write_loop, args=(ready,),
+                                           name="sqlite-writer", daemon=True)
+            self.writer.start()
+        ready.result()
+
+    def _write_loop(self, ready):
+        try:
+            conn = self._connect()
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")  # durable at checkpoints; safe with WAL
+        except Exception as e:
+            ready.set_exception(e)
+            with self.lock:
+                self.writer = None
+            return
+        ready.set_result(None)
+        while True:
+            fn, fut = self.writes.get()
+            if not fut.set_running_or_notify_cancel():
+                continue
+            try:
+                with conn:  # one transaction: commit, or roll back on error
+                    result = fn(conn)
+            except Exception as e:
+                fut.set_exception(e)
+            else:
+                fut.set_result(result)
+
+    def submit(self, fn):
+        """Run fn(conn) on the writer thread inside one transaction; returns a Future."""
+        self._start_writer()
+        fut = Future()
+        self.writes.put((fn, fut))
+        return fut
+
+    def transaction(self, fn):
+        """submit() and wait for the result."""
+        return self.submit(fn).result()
+
+    def execute(self, sql, params=()):
+        """Run one write statement; returns the affected row count."""
+        return self.transaction(lambda conn: conn.execute(sql, params).rowcount)
+
+    def executemany(self, sql, rows):
+        return self.transaction(lambda conn: conn.executemany(sql, rows).rowcount)
+
+    def executescript(self, script):
+        self.transaction(lambda conn: conn.executescript(script))
+
+    def query(self, sql, params=()):
+        return self._reader().execute(sql, params).fetchall()
+
+    def query_one(self, sql, params=()):
+        return self._reader().execute(sql, params).fetchone()
@@ -0,0 +1,142 @@
+"""
+Trade statistics rollups for enhanced_trading.db
+bot_stats (a single row, id 1) holds the running totals over closed
+trades; trade_stats_asset and trade_stats_day hold the same counters per
+symbol and per UTC+1 day. SQLite triggers on enhanced_trades keep all
+three current inside the same transaction that closes, edits or deletes a
+trade, so the totals never drift from the trades, whichever module writes
+them. Stats screens read one row instead of scanning every trade.
+
+A trade counts while its status is 'closed': the triggers subtract the old
+row and add the new one, so reopening a trade or changing its outcome or
+PnL is reflected too.
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+COUNTERS = """
+    total_trades INTEGER DEFAULT 0,
+    won_trades INTEGER DEFAULT 0,
+    lost_trades INTEGER DEFAULT 0,
+    total_profit REAL DEFAULT 0,
+    accuracy_rate REAL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+"""
+
+# bot_stats is also created by core/trading_core.py with the same columns
+TABLES = f"""
+CREATE TABLE IF NOT EXISTS bot_stats (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,{COUNTERS});
+CREATE TABLE IF NOT EXISTS trade_stats_asset (
+    symbol TEXT PRIMARY KEY,{COUNTERS});
+CREATE TABLE IF NOT EXISTS trade_stats_day (
+    day TEXT PRIMARY KEY,{COUNTERS});
+"""
+
+DAY = "date(COALESCE({r}.exit_time, {r}.entry_time), '+1 hour')"
+
+
+def _apply(table, key_sql, r, sign):
+    """Statements adding (sign '+') or removing (sign '-') trade row `r` (NEW/OLD)."""
+    cond = f"{r}.status = 'closed'"
+    key = f" AND {key_sql[0]} = {key_sql[1]}" if key_sql else " AND id = 1"
+    seed = (f"INSERT OR IGNORE INTO {table}({key_sql[0]}) SELECT {key_sql[1]} WHERE {cond};\n"
+            if key_sql else "")
+    return seed + f"""UPDATE {table} SET
+        total_trades = total_trades {sign} 1,
+        won_trades = won_trades {sign} ({r}.outcome IS 'won'),
+        lost_trades = lost_trades {sign} ({r}.outcome IS 'lost'),
+        total_profit = total_profit {sign} COALESCE({r}.pnl_percentage, 0),
+        accuracy_rate = CASE WHEN total_trades {sign} 1 > 0
+            THEN (won_trades {sign} ({r}.outcome IS 'won')) * 100.0 / (total_trades {sign} 1) ELSE 0 END,
+        updated_at = CURRENT_TIMESTAMP
+        WHERE {cond}{key};
+"""
+
+
+def _body(r, sign):
+    return (_apply("bot_stats", None, r, sign)
+            + _apply("trade_stats_asset", ("symbol", f"{r}.symbol"), r, sign)
+            + _apply("trade_stats_day", ("day", DAY.format(r=r)), r, sign))
+
+
+TRIGGERS = f"""
+CREATE TRIGGER IF NOT EXISTS trade_stats_insert AFTER INSERT ON enhanced_trades
+WHEN NEW.status = 'closed' BEGIN
+{_body("NEW", "+")}END;
+CREATE TRIGGER IF NOT EXISTS trade_stats_delete AFTER DELETE ON enhanced_trades
+WHEN OLD.status = 'closed' BEGIN
+{_body("OLD", "-")}END;
+CREATE TRIGGER IF NOT EXISTS trade_stats_update
+AFTER UPDATE OF symbol, status, outcome, pnl_percentage, entry_time, exit_time ON enhanced_trades
+WHEN OLD.status = 'closed' OR NEW.status = 'closed' BEGIN
+{_body("OLD", "-")}{_body("NEW", "+")}END;
+"""
+
+DROP_TRIGGERS = """
+DROP TRIGGER IF EXISTS trade_stats_insert;
+DROP TRIGGER IF EXISTS trade_stats_delete;
+DROP TRIGGER IF EXISTS trade_stats_update;
+"""
+
+BACKFILL = f"""
+DELETE FROM bot_stats;
+DELETE FROM trade_stats_asset;
+DELETE FROM trade_stats_day;
+INSERT INTO bot_stats(id, total_trades, won_trades, lost_trades, total_profit)
+    SELECT 1, COUNT(*), COALESCE(SUM(outcome IS 'won'), 0), COALESCE(SUM(outcome IS 'lost'), 0),
+           COALESCE(SUM(pnl_percentage), 0)
+    FROM enhanced_trades WHERE status = 'closed';
+INSERT INTO trade_stats_asset(symbol, total_trades, won_trades, lost_trades, total_profit)
+    SELECT symbol, COUNT(*), COALESCE(SUM(outcome IS 'won'), 0), COALESCE(SUM(outcome IS 'lost'), 0), COALESCE(SUM(pnl_percentage), 0)
+    FROM enhanced_trades WHERE status = 'closed' GROUP BY symbol;
+INSERT INTO trade_stats_day(day, total_trades, won_trades, lost_trades, total_profit)
+    SELECT {DAY.format(r="enhanced_trades")}, COUNT(*), COALESCE(SUM(outcome IS 'won'), 0), COALESCE(SUM(outcome IS 'lost'), 0),
+           COALESCE(SUM(pnl_percentage), 0)
+    FROM enhanced_trades WHERE status = 'closed' GROUP BY 1;
+UPDATE bot_stats SET accuracy_rate = CASE WHEN total_trades > 0 THEN won_trades * 100.0 / total_trades ELSE 0 END;
+UPDATE trade_stats_asset SET accuracy_rate = CASE WHEN total_trades > 0 THEN won_trades * 100.0 / total_trades ELSE 0 END;
+UPDATE trade_stats_day SET accuracy_rate = CASE WHEN total_trades > 0 THEN won_trades * 100.0 / total_trades ELSE 0 END;
+"""
+
+
+def setup_trade_stats(conn):
+    """Create the rollup tables and triggers (enhanced_trades must exist).
+    The first time, or when the triggers stored in the file differ from
+    TRIGGERS, the rollups are rebuilt from the trades already stored; from
+    then on the triggers maintain them."""
+    conn.executescript(TABLES)
+    row = conn.execute("SELECT sql FROM sqlite_master WHERE type='trigger' AND name='trade_stats_update'").fetchone()
+    # sqlite stores the CREATE TRIGGER text without "IF NOT EXISTS"
+    if row and row[0] in TRIGGERS.replace("IF NOT EXISTS ", ""):
+        return
+    logger.info("Building trade statistics rollups")
+    # one transaction: no trade may close between the backfill and the triggers
+    conn.executescript("BEGIN IMMEDIATE;" + DROP_TRIGGERS + BACKFILL + TRIGGERS + "COMMIT;")
+
+
+FIELDS = ("total_trades", "won_trades", "lost_trades", "total_profit", "accuracy_rate")
+
+
+def _row(row):
+    return dict(zip(FIELDS, row)) if row else dict.fromkeys(FIELDS, 0)
+
+
+def totals(conn):
+    return _row(conn.execute(f"SELECT {', '.join(FIELDS)} FROM bot_stats WHERE id = 1").fetchone())
+
+
+def asset_stats(conn, symbol=None):
+    """{symbol: counters} (or the counters of one symbol)."""
+    if symbol is not None:
+        return _row(conn.execute(f"SELECT {', '.join(FIELDS)} FROM trade_stats_asset WHERE symbol = ?",
+                                 (symbol,)).fetchone())
+    return {r[0]: _row(r[1:]) for r in conn.execute(f"SELECT symbol, {', '.join(FIELDS)} FROM trade_stats_asset")}
+
+
+def day_stats(conn, day):
+    """Counters for one UTC+1 day ('YYYY-MM-DD')."""
+    return _row(conn.execute(f"SELECT {', '.join(FIELDS)} FROM trade_stats_day WHERE day = ?",
+                             (day,)).fetchone())
@@ -5,10 +5,18 @@ import sqlite3
 from datetime import datetime
 import pytz
 from telegram import Bot
+from telegram.error import BadRequest, Forbidden, RetryAfter
 from telegram.ext import Application
 
+from core.rate_limit import TokenBucket, ChatLimiter
+from core.trade_stats import setup_trade_stats
+
 logger = logging.getLogger(__name__)
 
+BROADCAST_CONCURRENCY = int(os.getenv('BROADCAST_CONCURRENCY', '25'))  # sends in flight at once
+BROADCAST_RATE = float(os.getenv('BROADCAST_RATE', '30'))  # messages/second, Telegram's bot-wide limit
+BROADCAST_MAX_RETRIES = int(os.getenv('BROADCAST_MAX_RETRIES', '3'))
+
 class TradingSignalBot:
     def __init__(self):
         self.bot_token = os.getenv('TELEGRAM_TOKEN')
@@ -27,6 +35,12 @@ class TradingSignalBot:
             "GOLD", "SILVER", "OIL", "NATGAS", "SPX500"
         ]
         
+        # Broadcast limits: every send runs on the event loop, bounded by the
+        # semaphore and paced by Telegram's global and per-chat rate limits
+        self.send_semaphore = None
+        self.rate_limiter = TokenBucket(BROADCAST_RATE)
+        self.chat_limiter = ChatLimiter(1.0)
+        
     async def initialize(self):
         """Initialize the bot"""
         try:
@@ -34,6 +48,7 @@ class TradingSignalBot:
             
             # Initialize Telegram bot
             self.bot = Bot(token=self.bot_token)
+            self.send_semaphore = asyncio.Semaphore(BROADCAST_CONCURRENCY)
             self.application = Application.builder().token(self.bot_token).build()
             
             # Setup database
@@ -90,6 +105,9 @@ class TradingSignalBot:
             ''')
             
             self.conn.commit()
+            
+            # bot_stats plus per-asset/per-day rollups, kept current by triggers
+            setup_trade_stats(self.conn)
             logger.info("✅ Enhanced database setup complete")
             
         except Exception as e:
@@ -139,6 +157,57 @@ class TradingSignalBot:
         except Exception as e:
             logger.warning(f"⚠️ Could not send startup message: {e}")
     
+    async def get_subscriber_ids(self):
+        """Approved chat ids from subs.db"""
+        def load():
+            if not os.path.exists('subs.db'):
+                return []
+            conn = sqlite3.connect('subs.db')
+            try:
+                return [r[0] for r in conn.execute("SELECT chat_id FROM subscribers WHERE approved=1")]
+            finally:
+                conn.close()
+        try:
+            return await asyncio.to_thread(load)
+        except Exception as e:
+            logger.error(f"❌ Error loading subscribers: {e}")
+            return []
+    
+    async def send_to_chat(self, chat_id, text, parse_mode=None):
+        """Send one message within the rate limits; returns True if delivered"""
+        async with self.send_semaphore:
+            for attempt in range(BROADCAST_MAX_RETRIES + 1):
+                wait = max(self.chat_limiter.reserve(chat_id), self.rate_limiter.reserve())
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                try:
+                    await self.bot.send_message(chat_id=chat_id, text=text, parse_mode=parse_mode)
+                    return True
+                except RetryAfter as e:
+                    retry_after = e.retry_after
+                    if hasattr(retry_after, 'total_seconds'):
+                        retry_after = retry_after.total_seconds()
+                    logger.warning(f"⚠️ Telegram 429, pausing sends for {retry_after}s")
+                    self.rate_limiter.pause(float(retry_after))
+                except (Forbidden, BadRequest) as e:
+                    logger.warning(f"⚠️ Cannot send to {chat_id}: {e}")
+                    return False
+                except Exception as e:
+                    logger.warning(f"⚠️ Send to {chat_id} failed: {e}")
+                    return False
+            return False
+    
+    async def broadcast(self, text, chat_ids=None, parse_mode=None):
+        """Send text to every approved subscriber (or chat_ids) concurrently"""
+        if chat_ids is None:
+            chat_ids = await self.get_subscriber_ids()
+        if self.send_semaphore is None:
+            self.send_semaphore = asyncio.Semaphore(BROADCAST_CONCURRENCY)
+        results = await asyncio.gather(*(self.send_to_chat(cid, text, parse_mode) for cid in chat_ids))
+        sent = sum(results)
+        logger.info(f"📣 Broadcast delivered to {sent}/{len(chat_ids)} chats")
+        return sent, len(chat_ids) - sent
+    
     async def get_admin_id(self):
         """Get admin ID from existing database"""
         try:
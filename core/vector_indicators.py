@@ -0,0 +1,137 @@
+"""
+Vectorized indicator backend
+NumPy versions of the list indicators in lekzy_trade_ai.py (EMA, RSI, MACD,
+ATR, PSAR), computed on a 2-D array (symbols x bars) in one pass. Outputs
+have the same shape as the input, with NaN where the list functions put
+None.
+
+The arithmetic matches the list functions operation for operation (seed
+sums are accumulated left to right, recurrences use the same formulas), so
+every finite value is bit-for-bit the one the list function returns.
+Recursive smoothing still steps through time, but each step covers every
+symbol at once.
+"""
+
+import numpy as np
+
+
+def _as_2d(values):
+    arr = np.asarray(values, dtype=np.float64)
+    return (arr[np.newaxis, :], True) if arr.ndim == 1 else (arr, False)
+
+
+def _out(arr, squeeze):
+    return arr[0] if squeeze else arr
+
+
+def _sum_cols(arr, count):
+    """sum(x[:count]) per row, added left to right like Python's sum()."""
+    acc = np.zeros(arr.shape[0])
+    for j in range(count):
+        acc = acc + arr[:, j]
+    return acc
+
+
+def _ema_2d(arr, period):
+    rows, n = arr.shape
+    out = np.full((rows, n), np.nan)
+    if n < period:
+        return out
+    k = 2.0 / (period + 1.0)
+    k1 = 1 - k
+    ema = _sum_cols(arr, period) / period
+    out[:, period - 1] = ema
+    for i in range(period, n):
+        ema = arr[:, i] * k + ema * k1
+        out[:, i] = ema
+    return out
+
+
+def ema_np(prices, period):
+    arr, squeeze = _as_2d(prices)
+    return _out(_ema_2d(arr, period), squeeze)
+
+
+def rsi_np(prices, period=14):
+    arr, squeeze = _as_2d(prices)
+    rows, n = arr.shape
+    out = np.full((rows, n), np.nan)
+    if n < period + 1:
+        return _out(out, squeeze)
+    deltas = arr[:, 1:] - arr[:, :-1]
+    gains = np.where(deltas > 0, deltas, 0.0)
+    losses = np.where(deltas < 0, deltas, 0.0)
+    up = _sum_cols(gains, period) / period
+    down = -_sum_cols(losses, period) / period
+    rs = up / np.where(down != 0, down, 1e-9)
+    out[:, period] = 100. - 100. / (1. + rs)
+    pos = np.maximum(deltas, 0)
+    neg = np.maximum(-deltas, 0)
+    for i in range(period, n - 1):
+        up = (up * (period - 1) + pos[:, i]) / period
+        down = (down * (period - 1) + neg[:, i]) / period
+        rs = up / np.where(down != 0, down, 1e-9)
+        out[:, i + 1] = 100. - 100. / (1. + rs)
+    return _out(out, squeeze)
+
+
+def macd_np(prices, fast=12, slow=26, signal=9):
+    """Returns (macd_line, signal_line, histogram)."""
+    arr, squeeze = _as_2d(prices)
+    rows, n = arr.shape
+    macd_line = _ema_2d(arr, fast) - _ema_2d(arr, slow)
+    sig = np.full((rows, n), np.nan)
+    start = max(fast, slow) - 1
+    if n - start >= signal:
+        sig[:, start:] = _ema_2d(macd_line[:, start:], signal)
+    hist = macd_line - sig
+    return _out(macd_line, squeeze), _out(sig, squeeze), _out(hist, squeeze)
+
+
+def atr_np(highs, lows, closes, period=14):
+    h, squeeze = _as_2d(highs)
+    l, _ = _as_2d(lows)
+    c, _ = _as_2d(closes)
+    rows, n = c.shape
+    out = np.full((rows, n), np.nan)
+    if n - 1 < period:
+        return _out(out, squeeze)
+    prev = c[:, :-1]
+    trs = np.maximum(np.maximum(h[:, 1:] - l[:, 1:], np.abs(h[:, 1:] - prev)), np.abs(l[:, 1:] - prev))
+    atr = _sum_cols(trs, period) / period
+    out[:, period] = atr
+    for i in range(period, n - 1):
+        atr = (atr * (period - 1) + trs[:, i]) / period
+        out[:, i + 1] = atr
+    return _out(out, squeeze)
+
+
+def psar_np(highs, lows, step=0.02, max_step=0.2):
+    h, squeeze = _as_2d(highs)
+    l, _ = _as_2d(lows)
+    rows, n = h.shape
+    out = np.full((rows, n), np.nan)
+    if n < 2:
+        return _out(out, squeeze)
+    up = np.ones(rows, dtype=bool)
+    af = np.full(rows, step)
+    ep = h[:, 0].copy()
+    psar = l[:, 0] - (h[:, 0] - l[:, 0])
+    out[:, 0] = psar
+    for i in range(1, n):
+        hi = h[:, i]
+        lo = l[:, i]
+        val = np.where(up, psar + af * (ep - psar), psar - af * (psar - ep))
+        flip_down = up & (lo < val)
+        flip_up = ~up & (hi > val)
+        flip = flip_down | flip_up
+        val = np.where(flip, ep, val)
+        af = np.where(flip, step, af)
+        ep = np.where(flip_down, lo, np.where(flip_up, hi, ep))
+        up = up ^ flip
+        extend = (up & (hi > ep)) | (~up & (lo < ep))
+        ep = np.where(extend, np.where(up, hi, lo), ep)
+        af = np.where(extend, np.minimum(af + step, max_step), af)
+        psar = val
+        out[:, i] = val
+    return _out(out, squeeze)
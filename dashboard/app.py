@@ -0,0 +1,312 @@
+"""
+Live dashboard for Lekzy Trade AI
+A separate Flask process that follows the signal journal (logs/signals.db,
+see core/signal_journal.py) and pushes every new signal and result to the
+browser with Server-Sent Events.
+
+One follower thread polls the journal once per DASHBOARD_POLL_SECONDS for
+rows past the last rowid it has seen, plus the still-pending signals by
+primary key. It folds them into in-memory aggregates (totals, per-asset
+counts and the last DASHBOARD_RECENT signals in a bounded deque). Browsers
+only read those aggregates: a hundred open dashboards cost one journal
+poll per interval, nothing on the engine, and signals.csv is never read.
+
+Run: python dashboard/app.py   (DASHBOARD_PORT, default 8090)
+"""
+
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+
+from flask import Flask, Response, jsonify
+
+SIGNAL_DB = os.getenv("SIGNAL_DB", os.path.join(os.getenv("LOG_DIR", "logs"), "signals.db"))
+DASHBOARD_PORT = int(os.getenv("DASHBOARD_PORT", "8090"))
+DASHBOARD_RECENT = int(os.getenv("DASHBOARD_RECENT", "50"))
+DASHBOARD_POLL_SECONDS = float(os.getenv("DASHBOARD_POLL_SECONDS", "1"))
+CLIENT_QUEUE_MAX = 100  # events buffered per browser before it is dropped
+HEARTBEAT_SECONDS = 15
+
+COLUMNS = ("rowid", "signal_id", "ts", "asset", "direction", "confidence", "price",
+           "rsi", "entry_price", "exit_price", "result", "result_ts")
+SELECT = f"SELECT {', '.join(COLUMNS)} FROM signals"
+
+logger = logging.getLogger("lekzy.dashboard")
+app = Flask(__name__)
+
+
+def fmt_wat(ts):
+    if not ts:
+        return ""
+    return (datetime.fromtimestamp(ts, timezone.utc) + timedelta(hours=1)).strftime("%Y-%m-%d %H:%M:%S")
+
+
+class Aggregates:
+    """Running totals over the journal, updated one signal/result at a time."""
+
+    def __init__(self, recent=DASHBOARD_RECENT):
+        self.total = {"signals": 0, "wins": 0, "losses": 0, "draws": 0}
+        self.assets = {}
+        self.recent = deque(maxlen=recent)
+        self.recent_by_id = {}
+        self.updated = None
+
+    def _count(self, asset, key):
+        self.total[key] += 1
+        a = self.assets.setdefault(asset, {"signals": 0, "wins": 0, "losses": 0, "draws": 0})
+        a[key] += 1
+
+    def remember(self, row):
+        """Push a signal onto the recent deque (the oldest one falls off)."""
+        if len(self.recent) == self.recent.maxlen:
+            self.recent_by_id.pop(self.recent[0]["signal_id"], None)
+        item = {"signal_id": row["signal_id"], "time": fmt_wat(row["ts"]), "asset": row["asset"],
+                "direction": row["direction"], "confidence": row["confidence"], "price": row["price"],
+                "rsi": row["rsi"], "result": row["result"], "entry_price": row["entry_price"],
+                "exit_price": row["exit_price"]}
+        self.recent.append(item)
+        self.recent_by_id[item["signal_id"]] = item
+        return item
+
+    def add_signal(self, row):
+        self._count(row["asset"], "signals")
+        self.updated = time.time()
+        return dict(self.remember(row), result=None)
+
+    def add_result(self, row):
+        key = {"WIN": "wins", "LOSS": "losses", "DRAW": "draws"}.get(row["result"])
+        if key:
+            self._count(row["asset"], key)
+        item = self.recent_by_id.get(row["signal_id"])
+        if item is not None:
+            item.update(result=row["result"], entry_price=row["entry_price"], exit_price=row["exit_price"])
+        self.updated = time.time()
+        return {"signal_id": row["signal_id"], "asset": row["asset"], "result": row["result"],
+                "entry_price": row["entry_price"], "exit_price": row["exit_price"]}
+
+    @staticmethod
+    def _rate(c):
+        settled = c["wins"] + c["losses"]
+        return round(100.0 * c["wins"] / settled, 1) if settled else None
+
+    def stats(self):
+        return {
+            "total": dict(self.total, win_rate=self._rate(self.total)),
+            "assets": {a: dict(c, win_rate=self._rate(c)) for a, c in sorted(self.assets.items())},
+            "updated": fmt_wat(self.updated),
+        }
+
+    def snapshot(self):
+        return dict(self.stats(), recent=list(reversed(self.recent)))
+
+
+class JournalFollower:
+    """Tails the journal and fans events out to SSE clients."""
+
+    def __init__(self, path):
+        self.path = path
+        self.agg = Aggregates()
+        self.last_rowid = 0
+        self.pending = set()  # signal ids still waiting for a result
+        self.clients = set()
+        self.lock = threading.Lock()
+        self.conn = None
+
+    def _connect(self):
+        if self.conn is None:
+            if not os.path.exists(self.path):
+                return None
+            self.conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            self.conn.row_factory = sqlite3.Row
+            self._load()
+        return self.conn
+
+    def _load(self):
+        """Start-up only: seed the aggregates from the journal."""
+        with self.lock:
+            for asset, n, wins, losses, draws in self.conn.execute(
+                    "SELECT asset, COUNT(*), SUM(result='WIN'), SUM(result='LOSS'), SUM(result='DRAW') "
+                    "FROM signals GROUP BY asset"):
+                self.agg.assets[asset] = {"signals": n, "wins": wins or 0, "losses": losses or 0, "draws": draws or 0}
+                for k in self.agg.total:
+                    self.agg.total[k] += self.agg.assets[asset][k]
+            rows = self.conn.execute(SELECT + " ORDER BY rowid DESC LIMIT ?", (self.agg.recent.maxlen,)).fetchall()
+            for row in reversed(rows):
+                self.agg.remember(row)
+            self.last_rowid = self.conn.execute("SELECT COALESCE(MAX(rowid), 0) FROM signals").fetchone()[0]
+            self.pending = {r[0] for r in self.conn.execute("SELECT signal_id FROM signals WHERE result IS NULL")}
+
+    def poll(self):
+        conn = self._connect()
+        if conn is None:
+            return
+        events = []
+        new = conn.execute(SELECT + " WHERE rowid > ? ORDER BY rowid", (self.last_rowid,)).fetchall()
+        settled = []
+        if self.pending:
+            ids = list(self.pending)
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i + 500]
+                settled += conn.execute(SELECT + f" WHERE signal_id IN ({','.join('?' * len(chunk))})"
+                                        " AND result IS NOT NULL", chunk).fetchall()
+        with self.lock:
+            for row in new:
+                self.last_rowid = row["rowid"]
+                events.append(("signal", self.agg.add_signal(row)))
+                if row["result"] is None:
+                    self.pending.add(row["signal_id"])
+                else:
+                    events.append(("result", self.agg.add_result(row)))
+            for row in settled:
+                if row["signal_id"] in self.pending:
+                    self.pending.discard(row["signal_id"])
+                    events.append(("result", self.agg.add_result(row)))
+            if events:
+                events.append(("stats", self.agg.stats()))
+            clients = list(self.clients)
+        for event in events:
+            self.publish(event, clients)
+
+    def publish(self, event, clients):
+        msg = f"event: {event[0]}\ndata: {json.dumps(event[1])}\n\n"
+        for q in clients:
+            try:
+                q.put_nowait(msg)
+            except queue.Full:
+                self.unsubscribe(q)  # a stalled browser must not hold memory
+
+    def subscribe(self):
+        q = queue.Queue(maxsize=CLIENT_QUEUE_MAX)
+        with self.lock:
+            q.put_nowait(f"event: snapshot\ndata: {json.dumps(self.agg.snapshot())}\n\n")
+            self.clients.add(q)
+        return q
+
+    def unsubscribe(self, q):
+        with self.lock:
+            self.clients.discard(q)
+
+    def snapshot(self):
+        with self.lock:
+            return self.agg.snapshot()
+
+    def run(self):
+        while True:
+            try:
+                self.poll()
+            except sqlite3.Error as e:
+                logger.warning("Journal poll failed: %s", e)
+                self.conn = None
+            time.sleep(DASHBOARD_POLL_SECONDS)
+
+
+follower = JournalFollower(SIGNAL_DB)
+
+
+@app.route("/api/stats")
+def api_stats():
+    return jsonify(follower.snapshot())
+
+
+@app.route("/events")
+def events():
+    q = follower.subscribe()
+
+    def stream():
+        try:
+            while True:
+                try:
+                    yield q.get(timeout=HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+        finally:
+            follower.unsubscribe(q)
+
+    return Response(stream(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+PAGE = """<!doctype html>
+<html>
+<head><meta charset="utf-8"><title>Lekzy Trade AI — Live Dashboard</title></head>
+<body style="font-family: Arial; padding:20px;">
+  <h2>Lekzy Trade AI — Live Dashboard</h2>
+  <p id="total">Waiting for data…</p>
+  <h3>By asset</h3>
+  <table border="1" cellpadding="6" cellspacing="0" id="assets"></table>
+  <h3>Recent signals</h3>
+  <table border="1" cellpadding="6" cellspacing="0">
+    <thead><tr><th>Time (WAT)</th><th>ID</th><th>Asset</th><th>Dir</th><th>RSI</th><th>Conf</th><th>Price</th><th>Result</th></tr></thead>
+    <tbody id="recent"></tbody>
+  </table>
+  <p>Last updated: <span id="updated"></span></p>
+  <p><em>Educational demo — not financial advice.</em></p>
+<script>
+const MAX_RECENT = %(recent)d;
+const icons = {WIN: "WIN ✅", LOSS: "LOSS ❌", DRAW: "DRAW ➖", VOID: "VOID"};
+let recent = [];
+function esc(v) { return v === null || v === undefined ? "" : String(v).replace(/[&<>]/g, c => ({"&": "&amp;", "<": "&lt;", ">": "&gt;"})[c]); }
+function rate(r) { return r === null || r === undefined ? "-" : r + "%%"; }
+function showTotal(t) {
+  document.getElementById("total").innerHTML =
+    `<strong>Total signals:</strong> ${t.signals} — <strong>Wins:</strong> ${t.wins} — ` +
+    `<strong>Losses:</strong> ${t.losses} — <strong>Draws:</strong> ${t.draws} — <strong>Win rate:</strong> ${rate(t.win_rate)}`;
+  document.getElementById("updated").textContent = new Date().toLocaleString();
+}
+function showAssets(assets) {
+  let html = "<tr><th>Asset</th><th>Signals</th><th>Wins</th><th>Losses</th><th>Draws</th><th>Win rate</th></tr>";
+  for (const [a, c] of Object.entries(assets))
+    html += `<tr><td>${esc(a)}</td><td>${c.signals}</td><td>${c.wins}</td><td>${c.losses}</td><td>${c.draws}</td><td>${rate(c.win_rate)}</td></tr>`;
+  document.getElementById("assets").innerHTML = html;
+}
+function showRecent() {
+  document.getElementById("recent").innerHTML = recent.map(s =>
+    `<tr><td>${esc(s.time)}</td><td>${esc(s.signal_id)}</td><td>${esc(s.asset)}</td><td>${esc(s.direction)}</td>` +
+    `<td>${s.rsi === null ? "" : Math.round(s.rsi)}</td><td>${esc(s.confidence)}%%</td><td>${esc(s.price)}</td>` +
+    `<td>${s.result ? icons[s.result] || esc(s.result) : "pending"}</td></tr>`).join("");
+}
+const es = new EventSource("events");
+es.addEventListener("snapshot", e => {
+  const s = JSON.parse(e.data);
+  recent = s.recent;
+  showTotal(s.total); showAssets(s.assets); showRecent();
+});
+es.addEventListener("signal", e => {
+  const s = JSON.parse(e.data);
+  recent.unshift(s); recent.length = Math.min(recent.length, MAX_RECENT);
+  showRecent();
+});
+es.addEventListener("result", e => {
+  const r = JSON.parse(e.data);
+  const s = recent.find(x => x.signal_id === r.signal_id);
+  if (s) { Object.assign(s, r); showRecent(); }
+});
+es.addEventListener("stats", e => {
+  const s = JSON.parse(e.data);
+  showTotal(s.total); showAssets(s.assets);
+});
+</script>
+</body>
+</html>
+"""
+
+
+@app.route("/")
+def index():
+    return PAGE % {"recent": DASHBOARD_RECENT}
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    threading.Thread(target=follower.run, name="journal-follower", daemon=True).start()
+    app.run(host="0.0.0.0", port=DASHBOARD_PORT, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -12,6 +12,8 @@ import pytz
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import Application, CommandHandler, CallbackQueryHandler
 
+from core.trade_stats import setup_trade_stats, totals
+
 logger = logging.getLogger(__name__)
 UTC_PLUS_1 = pytz.timezone('Europe/Paris')
 
@@ -48,6 +50,9 @@ class EnhancedFeatures:
             ''')
             
             self.conn.commit()
+            
+            # rollups the stats screen reads instead of scanning enhanced_trades
+            setup_trade_stats(self.conn)
             logger.info("✅ Enhanced database setup complete")
         except Exception as e:
             logger.error(f"❌ Enhanced database setup failed: {e}")
@@ -220,20 +225,13 @@ class EnhancedFeatures:
     async def show_trading_stats(self, query):
         """Show trading statistics"""
         try:
-            self.cursor.execute('''
-                SELECT 
-                    COUNT(*) as total_trades,
-                    SUM(CASE WHEN outcome = 'won' THEN 1 ELSE 0 END) as won_trades,
-                    SUM(CASE WHEN outcome = 'lost' THEN 1 ELSE 0 END) as lost_trades
-                FROM enhanced_trades 
-                WHERE status = 'closed'
-            ''')
-            
-            result = self.cursor.fetchone()
+            stats = totals(self.conn)
             
-            if result and result[0] > 0:
-                total_trades, won_trades, lost_trades = result
-                win_rate = (won_trades / total_trades * 100) if total_trades > 0 else 0
+            if stats["total_trades"] > 0:
+                total_trades = stats["total_trades"]
+                won_trades = stats["won_trades"]
+                lost_trades = stats["lost_trades"]
+                win_rate = stats["accuracy_rate"]
                 
                 message = f"""
 📊 <b>ENHANCED TRADING STATS</b>
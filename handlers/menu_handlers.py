@@ -5,6 +5,8 @@ import sqlite3
 from datetime import datetime
 import pytz
 
+from core.trade_stats import totals
+
 logger = logging.getLogger(__name__)
 UTC_PLUS_1 = pytz.timezone('Europe/Paris')
 
@@ -121,24 +123,16 @@ async def show_trading_stats(query):
     """Show trading statistics"""
     try:
         conn = sqlite3.connect('enhanced_trading.db')
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT 
-                COUNT(*) as total_trades,
-                SUM(CASE WHEN outcome = 'won' THEN 1 ELSE 0 END) as won_trades,
-                SUM(CASE WHEN outcome = 'lost' THEN 1 ELSE 0 END) as lost_trades,
-                SUM(pnl_percentage) as total_pnl
-            FROM enhanced_trades 
-            WHERE status = 'closed'
-        ''')
-        
-        result = cursor.fetchone()
+        # one row kept current by core/trade_stats.py triggers
+        stats = totals(conn)
         conn.close()
         
-        if result and result[0] > 0:
-            total_trades, won_trades, lost_trades, total_pnl = result
-            win_rate = (won_trades / total_trades * 100) if total_trades > 0 else 0
+        if stats["total_trades"] > 0:
+            total_trades = stats["total_trades"]
+            won_trades = stats["won_trades"]
+            lost_trades = stats["lost_trades"]
+            total_pnl = stats["total_profit"]
+            win_rate = stats["accuracy_rate"]
             
             message = f"""
 📊 <b>TRADING STATISTICS</b>
@@ -2,12 +2,22 @@ import os
 import sys
 import time
 import json
-import sqlite3
-import math
+import copy
 import random
 import threading
 import csv
+import atexit
 import logging
+import re
+import heapq
+import hashlib
+import hmac
+import bisect
+import queue
+import itertools
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 
 from flask import Flask, request, jsonify, abort
@@ -16,6 +26,12 @@ import telebot
 from telebot.apihelper import ApiTelegramException
 from dotenv import load_dotenv
 
+from core.candle_file import CandleFile, candle_path
+from core.metrics import Counter, Gauge, Histogram, REGISTRY, CONTENT_TYPE
+from core.rate_limit import TokenBucket, ChatLimiter
+from core.sqlite_db import Database
+from core.signal_journal import SignalJournal
+
 # Load .env if present
 load_dotenv()
 
@@ -32,12 +48,16 @@ if not TWELVE_API_KEY:
 
 RUN_MODE = os.getenv("RUN_MODE", "web")  # "web" or "poll"
 PORT = int(os.getenv("PORT", "8080"))
+# In "web" mode with WEBHOOK_URL set (public https base, e.g. https://app.up.railway.app)
+# Telegram pushes updates to WEBHOOK_URL/telegram/<secret> instead of being polled
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "").rstrip("/")
+TELEGRAM_WEBHOOK_SECRET = os.getenv("TELEGRAM_WEBHOOK_SECRET") or hashlib.sha256(TELEGRAM_TOKEN.encode()).hexdigest()[:32]
+UPDATE_WORKERS = int(os.getenv("UPDATE_WORKERS", "4"))
 DB_FILE = os.getenv("DB_FILE", "subs.db")
 LOG_DIR = os.getenv("LOG_DIR", "logs")
 PRE_ALERT_SECONDS = int(os.getenv("PRE_ALERT_SECONDS", "60"))     # pre-alert seconds before entry
 CONFIRMATION_SECONDS = int(os.getenv("CONFIRMATION_SECONDS", "30"))
-RESULT_DELAY_SECONDS = int(os.getenv("RESULT_DELAY_SECONDS", "120"))
-POST_GAP_MIN = int(os.getenv("POST_GAP_MIN", "120"))
+POST_GAP_MIN = int(os.getenv("POST_GAP_MIN", "120"))  # per-asset cooldown after a signal expires
 POST_GAP_MAX = int(os.getenv("POST_GAP_MAX", "180"))
 
 # Assets - stable & liquid (you can adjust)
@@ -49,25 +69,23 @@ ASSETS = [
 ]
 
 TD_BASE = "https://api.twelvedata.com"
+TD_CREDITS_PER_MINUTE = int(os.getenv("TD_CREDITS_PER_MINUTE", "8"))  # plan limit
+TD_MAX_RETRIES = int(os.getenv("TD_MAX_RETRIES", "2"))
 
 BOT_BRAND = "Lekzy FX Pro"
 BOT_TAGLINE = "⚡ Signal powered by Lekzy FX Premium Intelligence"
 
 # Intervals
 PRIMARY_INTERVAL = "1min"
-SECONDARY_INTERVAL = "5min"
+SECONDARY_TF = "M5"  # confirmation bars, resampled from PRIMARY_INTERVAL
 USE_M5_CONFIRM = True
 
-# Indicator params
-EMA_FAST = 9
-EMA_SLOW = 21
-MACD_FAST = 12
-MACD_SLOW = 26
-MACD_SIGNAL = 9
-RSI_PERIOD = 14
-ATR_PERIOD = 14
-PSAR_STEP = 0.02
-PSAR_MAX = 0.2
+# Indicator params and rule thresholds live in core/signal_rules.py so the
+# backtester (core/backtest.py) runs exactly the same rule set
+from core.signal_rules import (
+    EMA_FAST, EMA_SLOW, MACD_FAST, MACD_SLOW, MACD_SIGNAL, RSI_PERIOD, ATR_PERIOD,
+    PSAR_STEP, PSAR_MAX, confluence, higher_tf_ok, decide,
+)
 
 # Ensure directories
 os.makedirs(LOG_DIR, exist_ok=True)
@@ -80,59 +98,93 @@ logging.basicConfig(
 )
 logger = logging.getLogger("lekzy")
 
+# -------------------- Metrics --------------------
+# Exposed in Prometheus text format on /metrics (see core/metrics.py).
+# Queue depths and subscriber counts are read at scrape time.
+TD_REQUESTS = Counter("lekzy_twelvedata_requests_total", "TwelveData API requests", ["endpoint"])
+TD_CREDITS = Counter("lekzy_twelvedata_credits_total", "TwelveData API credits spent")
+TD_RATE_LIMITED = Counter("lekzy_twelvedata_rate_limited_total", "TwelveData 429 responses")
+TD_CREDIT_WAIT = Counter("lekzy_twelvedata_credit_wait_seconds_total",
+                         "Seconds spent waiting for TwelveData credits")
+TD_CREDIT_LIMIT = Gauge("lekzy_twelvedata_credit_limit", "TwelveData credits per minute",
+                        fn=lambda: td_budget.limit)
+FETCH_SECONDS = Histogram("lekzy_fetch_ohlc_seconds", "OHLC fetch latency, credit waits included", ["call"])
+EVALUATE_SECONDS = Histogram("lekzy_evaluate_signal_seconds", "evaluate_signal duration",
+                             buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1, 5, 30))
+SIGNALS = Counter("lekzy_signals_total", "Signals scheduled for broadcast", ["asset", "source"])
+BROADCAST_MESSAGES = Counter("lekzy_broadcast_messages_total", "Telegram broadcast deliveries", ["outcome"])
+Gauge("lekzy_broadcast_queue_depth", "Messages waiting for a broadcast sender",
+      fn=lambda: broadcaster.queue.qsize())
+Gauge("lekzy_scheduler_pending", "Alerts waiting in the alert scheduler", fn=lambda: len(alert_scheduler))
+Gauge("lekzy_subscribers", "Subscribers by state", ["state"], fn=lambda: subscriber_counts())
+
 # -------------------- DB & Persist --------------------
+# All subs.db access goes through one Database (core/sqlite_db.py): WAL mode,
+# a persistent connection per reading thread and a single writer thread.
+db = Database(DB_FILE)
+
 def init_db():
-    conn = sqlite3.connect(DB_FILE)
-    cur = conn.cursor()
-    cur.execute("""
+    db.executescript("""
     CREATE TABLE IF NOT EXISTS subscribers(
         chat_id INTEGER PRIMARY KEY,
         username TEXT,
         approved INTEGER DEFAULT 0,
         joined_at TEXT
-    )
+    );
     """)
-    conn.commit()
-    conn.close()
+    _load_approved()
+
+# Approved chat ids, kept in memory so broadcasts and the engine never query
+# SQLite. Loaded once, then updated by approve/reject right after their
+# write commits (write-through); add_subscriber only inserts pending rows.
+_approved = None
+_approved_lock = threading.Lock()
+
+def _load_approved():
+    global _approved
+    rows = db.query("SELECT chat_id FROM subscribers WHERE approved=1")
+    with _approved_lock:
+        _approved = {r[0] for r in rows}
 
 def add_subscriber(chat_id, username):
-    conn = sqlite3.connect(DB_FILE)
-    cur = conn.cursor()
     now = datetime.utcnow().isoformat()
-    cur.execute("INSERT OR IGNORE INTO subscribers(chat_id, username, approved, joined_at) VALUES(?,?,0,?)",
-                (chat_id, username, now))
-    conn.commit()
-    conn.close()
+    db.execute("INSERT OR IGNORE INTO subscribers(chat_id, username, approved, joined_at) VALUES(?,?,0,?)",
+               (chat_id, username, now))
 
 def approve_subscriber(chat_id):
-    conn = sqlite3.connect(DB_FILE)
-    cur = conn.cursor()
-    cur.execute("UPDATE subscribers SET approved=1 WHERE chat_id=?", (chat_id,))
-    conn.commit()
-    conn.close()
+    if db.execute("UPDATE subscribers SET approved=1 WHERE chat_id=?", (chat_id,)):
+        with _approved_lock:
+            if _approved is not None:
+                _approved.add(chat_id)
 
 def reject_subscriber(chat_id):
-    conn = sqlite3.connect(DB_FILE)
-    cur = conn.cursor()
-    cur.execute("DELETE FROM subscribers WHERE chat_id=?", (chat_id,))
-    conn.commit()
-    conn.close()
+    db.execute("DELETE FROM subscribers WHERE chat_id=?", (chat_id,))
+    with _approved_lock:
+        if _approved is not None:
+            _approved.discard(chat_id)
 
 def list_subscribers():
-    conn = sqlite3.connect(DB_FILE)
-    cur = conn.cursor()
-    cur.execute("SELECT chat_id, username, approved, joined_at FROM subscribers")
-    rows = cur.fetchall()
-    conn.close()
-    return rows
+    return db.query("SELECT chat_id, username, approved, joined_at FROM subscribers")
 
 def get_approved_subs():
-    conn = sqlite3.connect(DB_FILE)
-    cur = conn.cursor()
-    cur.execute("SELECT chat_id FROM subscribers WHERE approved=1")
-    rows = cur.fetchall()
-    conn.close()
-    return [r[0] for r in rows]
+    if _approved is None:
+        _load_approved()
+    with _approved_lock:
+        return list(_approved)
+
+def subscriber_counts():
+    # approved from the in-memory set; only pending requests need a query
+    if _approved is None:
+        _load_approved()
+    with _approved_lock:
+        approved = len(_approved)
+    pending = db.query_one("SELECT COUNT(*) FROM subscribers WHERE approved=0")[0]
+    return {("approved",): approved, ("pending",): pending}
+
+def has_approved_subs():
+    if _approved is None:
+        _load_approved()
+    return bool(_approved)
 
 # -------------------- Time helpers (UTC+1) --------------------
 UTC = timezone.utc
@@ -257,13 +309,91 @@ def cmd_subs(message):
         text += f"{r[0]} - {r[1]} - {'approved' if r[2] else 'pending'} - joined {r[3]}\n"
     bot.reply_to(message, text[:4000])
 
+@bot.message_handler(commands=["alerts"])
+def cmd_alerts(message):
+    if message.from_user.id not in ADMIN_IDS:
+        bot.reply_to(message, "Only admins can list alerts.")
+        return
+    jobs = alert_scheduler.pending()
+    text = f"Pending alerts: {len(jobs)}\n"
+    for fire_at, job_id, name, tag in jobs:
+        text += f"{job_id} - {tag} {name} - in {max(0, int(fire_at - time.time()))}s\n"
+    bot.reply_to(message, text[:4000])
+
+@bot.message_handler(commands=["cancel"])
+def cmd_cancel(message):
+    if message.from_user.id not in ADMIN_IDS:
+        bot.reply_to(message, "Only admins can cancel alerts.")
+        return
+    parts = message.text.split()
+    if len(parts) < 2:
+        bot.reply_to(message, "Usage: /cancel <signal_id>")
+        return
+    n = alert_scheduler.cancel_tag(parts[1])
+    bot.reply_to(message, f"Cancelled {n} alert(s) for {parts[1]}")
+
 # -------------------- Broadcast helper --------------------
-def broadcast(text, parse_mode="Markdown"):
-    subs = get_approved_subs()
-    for uid in subs:
+# broadcast() queues one delivery per approved subscriber and returns; a
+# pool of sender threads drains the queue under Telegram's limits (a global
+# token bucket and one message per second per chat, see core/rate_limit.py).
+# Delivery time for N subscribers is about N / BROADCAST_RATE seconds rather
+# than N round trips. A 429 pauses every sender for its retry_after and the
+# message is queued again.
+BROADCAST_WORKERS = int(os.getenv("BROADCAST_WORKERS", "8"))
+BROADCAST_RATE = float(os.getenv("BROADCAST_RATE", "30"))  # messages/second, Telegram's bot-wide limit
+BROADCAST_MAX_RETRIES = int(os.getenv("BROADCAST_MAX_RETRIES", "3"))
+
+class BroadcastFanout:
+    def __init__(self, workers=BROADCAST_WORKERS, rate=BROADCAST_RATE):
+        self.queue = queue.Queue()
+        self.bucket = TokenBucket(rate)
+        self.chats = ChatLimiter(1.0)
+        self.workers = workers
+        self.threads = []
+        self.lock = threading.Lock()
+
+    def start(self):
+        with self.lock:
+            while len(self.threads) < self.workers:
+                t = threading.Thread(target=self._worker, name=f"broadcast-{len(self.threads)}", daemon=True)
+                t.start()
+                self.threads.append(t)
+
+    def send_all(self, chat_ids, text, parse_mode="Markdown"):
+        self.start()
+        for uid in chat_ids:
+            self.queue.put((uid, text, parse_mode, 0))
+        return len(chat_ids)
+
+    def _worker(self):
+        while True:
+            item = self.queue.get()
+            try:
+                self._deliver(*item)
+            except Exception as e:
+                BROADCAST_MESSAGES.inc(outcome="failed")
+                logger.warning("General send error to %s: %s", item[0], e)
+
+    def _deliver(self, uid, text, parse_mode, attempt):
+        wait = self.chats.reserve(uid)
+        if wait > 0:
+            time.sleep(wait)
+        self.bucket.acquire()
         try:
             bot.send_message(uid, text, parse_mode=parse_mode)
+            BROADCAST_MESSAGES.inc(outcome="sent")
         except ApiTelegramException as e:
+            if e.error_code == 429:
+                retry_after = ((e.result_json or {}).get("parameters") or {}).get("retry_after", 1)
+                logger.warning("Telegram 429, pausing sends for %ss", retry_after)
+                BROADCAST_MESSAGES.inc(outcome="throttled")
+                self.bucket.pause(retry_after)
+                if attempt < BROADCAST_MAX_RETRIES:
+                    self.queue.put((uid, text, parse_mode, attempt + 1))
+                else:
+                    BROADCAST_MESSAGES.inc(outcome="failed")
+                return
+            BROADCAST_MESSAGES.inc(outcome="failed")
             s = str(e).lower()
             logger.warning("Error sending to %s: %s", uid, e)
             # If blocked or chat not found, remove
@@ -271,27 +401,131 @@ def broadcast(text, parse_mode="Markdown"):
                 try:
                     reject_subscriber(uid)
                 except: pass
-        except Exception as e:
-            logger.warning("General send error to %s: %s", uid, e)
+
+broadcaster = BroadcastFanout()
+
+def broadcast(text, parse_mode="Markdown"):
+    """Queue `text` for every approved subscriber; returns how many were queued."""
+    return broadcaster.send_all(get_approved_subs(), text, parse_mode)
+
+# -------------------- TwelveData credit budget --------------------
+# Every TwelveData call goes through td_get, which takes its credits from a
+# per-minute bucket refilled on each minute boundary (the way TwelveData
+# counts). Callers wait in priority order, and a 429 blocks everyone until
+# the next minute and adopts the limit the API reports.
+PRIORITY_RESULT = 0  # result checks go first
+PRIORITY_SCAN = 1
+
+class CreditBudget:
+    def __init__(self, per_minute):
+        self.limit = per_minute
+        self.minute = int(time.time()) // 60
+        self.available = per_minute
+        self.blocked_until = 0.0
+        self.cond = threading.Condition()
+        self.waiting = []  # heap of (priority, seq)
+        self.seq = itertools.count()
+
+    def _refill(self, now):
+        minute = int(now) // 60
+        if minute != self.minute:
+            self.minute = minute
+            self.available = self.limit
+
+    def _wait_time(self, credits, now):
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        self._refill(now)
+        if self.available >= credits:
+            return 0
+        return (self.minute + 1) * 60 - now
+
+    def acquire(self, credits=1, priority=PRIORITY_SCAN):
+        if credits > self.limit:
+            raise ValueError(f"request needs {credits} credits, plan allows {self.limit}/min")
+        with self.cond:
+            ticket = (priority, next(self.seq))
+            heapq.heappush(self.waiting, ticket)
+            try:
+                while True:
+                    if credits > self.limit:
+                        # backoff() adopted a lower plan limit while we waited
+                        raise ValueError(f"request needs {credits} credits, plan allows {self.limit}/min")
+                    wait = None
+                    if self.waiting[0] == ticket:
+                        wait = self._wait_time(credits, time.time())
+                        if wait <= 0:
+                            self.available -= credits
+                            return
+                    self.cond.wait(wait)
+            finally:
+                self.waiting.remove(ticket)
+                heapq.heapify(self.waiting)
+                self.cond.notify_all()
+
+    def backoff(self, message=""):
+        """Called on a 429: no more calls this minute; adopt the reported plan limit."""
+        m = re.search(r"current limit being (\d+)", message or "")
+        with self.cond:
+            if m and int(m.group(1)) != self.limit:
+                logger.warning("TwelveData credit limit is %s/min (configured %s)", m.group(1), self.limit)
+                self.limit = max(1, int(m.group(1)))
+            now = time.time()
+            self.blocked_until = (int(now) // 60 + 1) * 60
+            self.available = 0
+            self.cond.notify_all()
+
+td_budget = CreditBudget(TD_CREDITS_PER_MINUTE)
+
+def td_get(endpoint, params, credits=1, priority=PRIORITY_SCAN, timeout=12):
+    """`params` may be a function returning them; it is called once the
+    credits are granted, so it can depend on how long the wait took."""
+    for attempt in range(TD_MAX_RETRIES + 1):
+        start = time.monotonic()
+        td_budget.acquire(credits, priority)
+        TD_CREDIT_WAIT.inc(time.monotonic() - start)
+        TD_REQUESTS.inc(endpoint=endpoint)
+        TD_CREDITS.inc(credits)
+        r = requests.get(f"{TD_BASE}/{endpoint}", params=params() if callable(params) else params,
+                         timeout=timeout)
+        data = r.json() if r.status_code == 429 else None
+        if data is None:
+            r.raise_for_status()
+            data = r.json()
+        if isinstance(data, dict) and data.get("code") == 429:
+            logger.warning("TwelveData 429, backing off to next minute: %s", data.get("message"))
+            TD_RATE_LIMITED.inc()
+            td_budget.backoff(data.get("message", ""))
+            continue
+        return data
+    raise RuntimeError(f"TwelveData rate limited after {TD_MAX_RETRIES + 1} attempts")
 
 # -------------------- TwelveData fetch (lightweight) --------------------
-def fetch_ohlc(symbol, interval="1min", outputsize=200, timeout=12):
-    if not TWELVE_API_KEY:
-        raise RuntimeError("TwelveData API key not set")
-    params = {
-        "symbol": symbol.replace("/", ""),
+def _td_params(symbols, interval, outputsize):
+    """td_get params, built when the credits are granted. outputsize may be a
+    function of the symbols: a wait that crosses a candle close then still
+    asks for every bar missing at that point."""
+    if callable(outputsize):
+        return lambda: _td_params(symbols, interval, outputsize(symbols))
+    return {
+        "symbol": ",".join(sym.replace("/", "") for sym in symbols),
         "interval": interval,
         "apikey": TWELVE_API_KEY,
         "outputsize": outputsize,
+        "timezone": "UTC",
         "format": "JSON"
     }
-    r = requests.get(f"{TD_BASE}/time_series", params=params, timeout=timeout)
-    r.raise_for_status()
-    data = r.json()
+
+def td_epoch(ts):
+    # TwelveData datetimes are requested in UTC (see fetch_ohlc)
+    fmt = "%Y-%m-%d %H:%M:%S" if len(ts) > 10 else "%Y-%m-%d"
+    return int(datetime.strptime(ts, fmt).replace(tzinfo=UTC).timestamp())
+
+def _parse_values(data):
     if "values" not in data:
         raise RuntimeError(f"TwelveData error: {data}")
     vals = list(reversed(data["values"]))  # oldest -> newest
-    times = [v["datetime"] for v in vals]
+    times = [td_epoch(v["datetime"]) for v in vals]
     opens = [float(v["open"]) for v in vals]
     highs = [float(v["high"]) for v in vals]
     lows = [float(v["low"]) for v in vals]
@@ -299,6 +533,312 @@ def fetch_ohlc(symbol, interval="1min", outputsize=200, timeout=12):
     volumes = [float(v.get("volume", 0)) for v in vals]
     return {"time": times, "open": opens, "high": highs, "low": lows, "close": closes, "volume": volumes}
 
+@FETCH_SECONDS.timed(call="fetch_ohlc")
+def fetch_ohlc(symbol, interval="1min", outputsize=200, timeout=12, priority=PRIORITY_SCAN):
+    if not TWELVE_API_KEY:
+        raise RuntimeError("TwelveData API key not set")
+    return _parse_values(td_get("time_series", _td_params([symbol], interval, outputsize),
+                                priority=priority, timeout=timeout))
+
+TD_MAX_BATCH = 120  # symbols per time_series call accepted by TwelveData
+
+@FETCH_SECONDS.timed(call="fetch_ohlc_batch")
+def fetch_ohlc_batch(symbols, interval="1min", outputsize=200, timeout=20, priority=PRIORITY_SCAN):
+    """One time_series request for many symbols; returns {symbol: ohlc}.
+    Symbols TwelveData reports an error for are logged and left out.
+    Note: each symbol still costs one API credit, so chunks never exceed
+    the per-minute credit limit."""
+    if not TWELVE_API_KEY:
+        raise RuntimeError("TwelveData API key not set")
+    out = {}
+    size = max(1, min(TD_MAX_BATCH, td_budget.limit))
+    for i in range(0, len(symbols), size):
+        chunk = symbols[i:i + size]
+        data = td_get("time_series", _td_params(chunk, interval, outputsize),
+                      credits=len(chunk), priority=priority, timeout=timeout)
+        if len(chunk) == 1:
+            # single-symbol responses are not keyed by symbol
+            data = {chunk[0].replace("/", ""): data}
+        elif data.get("status") == "error":
+            raise RuntimeError(f"TwelveData error: {data}")
+        for sym in chunk:
+            try:
+                out[sym] = _parse_values(data.get(sym.replace("/", ""), {}))
+            except RuntimeError as e:
+                logger.warning("Batch fetch %s %s: %s", sym, interval, e)
+    return out
+
+# -------------------- Candle store --------------------
+# Bars only change when a candle closes, so a series is reused until the next
+# close of its interval: repeated scans, webhook re-checks and result lookups
+# inside one candle cost no API credits. Each (symbol, interval) keeps a
+# fixed-size ring buffer; after the first load only the bars from the last
+# stored one onwards are requested, and the oldest fall off the front.
+INTERVAL_SECONDS = {"1min": 60, "5min": 300, "15min": 900, "30min": 1800, "1h": 3600}
+TF_SECONDS = {"M1": 60, "M5": 300, "M15": 900, "H1": 3600}
+CANDLE_CAPACITY = int(os.getenv("CANDLE_CAPACITY", "600"))  # 600 M1 bars = 120 M5 bars
+# closed bars are also appended to memory-mapped files here (see core/candle_file.py)
+# so a restart reloads them instantly and only fetches the missing tail; "" disables
+CANDLE_DIR = os.getenv("CANDLE_DIR", os.path.join("data", "candles"))
+OHLC_FIELDS = ("time", "open", "high", "low", "close", "volume")
+
+def next_candle_close(interval, now=None):
+    tf = INTERVAL_SECONDS.get(interval, 60)
+    if now is None:
+        now = time.time()
+    return (int(now) // tf + 1) * tf
+
+CANDLE_TYPECODES = {"time": "q", "open": "d", "high": "d", "low": "d", "close": "d", "volume": "d"}
+
+class CandleSeries:
+    """Bars of one (symbol, interval) in typed arrays: int64 epoch seconds and
+    float64 prices, about 8 bytes per value instead of a boxed float or a
+    datetime string. Columns have some slack past `capacity`; new bars are
+    written at the end and, when the slack runs out, the live bars are moved
+    back to the front in one memmove. The newest n bars are therefore always
+    one contiguous slice, and window() returns memoryviews over it instead of
+    copies. Views are only stable while `lock` is held: the next refresh
+    writes into the same memory."""
+    def __init__(self, interval, capacity):
+        self.interval = interval
+        self.tf = INTERVAL_SECONDS.get(interval, 60)
+        self.capacity = capacity
+        self.size = capacity + max(16, capacity // 4)
+        self.cols = {f: array(tc, bytes(8 * self.size)) for f, tc in CANDLE_TYPECODES.items()}
+        self.views = {f: memoryview(col) for f, col in self.cols.items()}
+        self.start = 0
+        self.end = 0
+        self.last_epoch = None
+        self.expires_at = 0
+        self.indicators = None  # IndicatorSet, created by evaluate_signal
+        self.file = None  # CandleFile when CANDLE_DIR is set
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return self.end - self.start
+
+    @property
+    def bars(self):
+        return self.window(self.capacity)
+
+    @property
+    def epochs(self):
+        return self.views["time"][self.start:self.end]
+
+    def clear(self):
+        self.start = self.end = 0
+        self.last_epoch = None
+        self.indicators = None
+
+    def _append(self, bar):
+        if self.end == self.size:
+            n = len(self)
+            for col in self.cols.values():
+                col[0:n] = col[self.start:self.end]
+            self.start, self.end = 0, n
+        for f, col in self.cols.items():
+            col[self.end] = bar[f]
+        self.end += 1
+        if self.end - self.start > self.capacity:
+            self.start += 1
+
+    def missing_bars(self, now, last_epoch=-1):
+        """How many bars to request so the stored tail (or one ending at
+        `last_epoch`) is current again."""
+        last_epoch = self.last_epoch if last_epoch == -1 else last_epoch
+        if last_epoch is None:
+            return self.capacity
+        candle_open = int(now) // self.tf * self.tf
+        # the last stored bar is re-requested: it was still forming when fetched
+        return max(1, min(self.capacity, (candle_open - last_epoch) // self.tf + 1))
+
+    def merge(self, o):
+        """Append bars newer than the stored tail; a bar with the same timestamp
+        as the tail replaces it. Returns False if `o` does not overlap the tail."""
+        epochs = o["time"]
+        if self.last_epoch is not None and len(epochs) and epochs[0] > self.last_epoch:
+            return False
+        for i, ep in enumerate(epochs):
+            if self.last_epoch is not None and ep < self.last_epoch:
+                continue
+            if ep == self.last_epoch:
+                for f, col in self.cols.items():
+                    col[self.end - 1] = o[f][i]
+            else:
+                self._append({f: o[f][i] for f in OHLC_FIELDS})
+                self.last_epoch = ep
+        return True
+
+    def bar_at(self, epoch):
+        """The stored bar that opened at `epoch` as a dict, or None."""
+        ep = self.epochs
+        i = bisect.bisect_left(ep, epoch)
+        if i == len(ep) or ep[i] != epoch:
+            return None
+        j = self.start + i
+        return {f: col[j] for f, col in self.cols.items()}
+
+    def window(self, n, copy=False):
+        """Last n bars as memoryviews (or array copies that outlive the lock)."""
+        lo = max(self.start, self.end - n)
+        if copy:
+            return {f: col[lo:self.end] for f, col in self.cols.items()}
+        return {f: v[lo:self.end] for f, v in self.views.items()}
+
+class CandleStore:
+    def __init__(self, capacity=CANDLE_CAPACITY, root=CANDLE_DIR):
+        self.capacity = capacity
+        self.root = root
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def get_series(self, symbol, interval, min_capacity=0):
+        key = (symbol, interval)
+        with self.lock:
+            s = self.series.get(key)
+            if s is None:
+                s = self.series[key] = CandleSeries(interval, max(self.capacity, min_capacity))
+                if self.root:
+                    self._attach_file(symbol, s)
+            return s
+
+    def _attach_file(self, symbol, s):
+        try:
+            s.file = CandleFile(candle_path(self.root, symbol, s.interval), s.tf)
+            s.merge(s.file.tail(s.capacity))
+            if len(s):
+                logger.info("Loaded %s stored %s bars for %s", len(s), s.interval, symbol)
+        except (OSError, ValueError) as e:
+            logger.warning("Candle file for %s %s unavailable: %s", symbol, s.interval, e)
+            s.file = None
+
+    def _persist(self, s, now):
+        """Append bars that have closed since the last write to the series' file."""
+        if s.file is None or not len(s):
+            return
+        try:
+            last = s.file.last_epoch()
+            b = s.bars
+            ep = b["time"]
+            i = len(ep)
+            while i > 0 and (last is None or ep[i - 1] > last):
+                i -= 1
+            candle_open = int(now) // s.tf * s.tf
+            rows = [(ep[j], b["open"][j], b["high"][j], b["low"][j], b["close"][j], b["volume"][j])
+                    for j in range(i, len(ep)) if ep[j] < candle_open]
+            if rows:
+                s.file.write(rows)
+        except OSError as e:
+            logger.warning("Candle file write failed for %s: %s", s.file.path, e)
+
+    def refresh(self, symbol, interval, outputsize, priority=PRIORITY_SCAN):
+        s = self.get_series(symbol, interval, outputsize)
+        # one refresh per series at a time; concurrent callers wait and reuse it
+        with s.lock:
+            now = time.time()
+            if now < s.expires_at and s.last_epoch is not None:
+                return s
+            if s.missing_bars(now) >= s.capacity:
+                s.clear()
+            # sized when the credits are granted: the wait may cross a candle close
+            o = fetch_ohlc(symbol, interval=interval, outputsize=lambda _: s.missing_bars(time.time()),
+                           priority=priority)
+            if not s.merge(o):
+                # gap between the stored tail and the new bars: reload the window
+                logger.info("Candle gap for %s %s, reloading %s bars", symbol, interval, s.capacity)
+                s.clear()
+                s.merge(fetch_ohlc(symbol, interval=interval, outputsize=s.capacity, priority=priority))
+            now = time.time()
+            s.expires_at = next_candle_close(interval, now)
+            self._persist(s, now)
+            return s
+
+    def refresh_many(self, symbols, interval, outputsize, priority=PRIORITY_SCAN):
+        """Bring every stale series in `symbols` up to date with one batched request.
+        The series locks are not held while fetching: a wait for credits here
+        must not hold up result lookups on the same series."""
+        series = {sym: self.get_series(sym, interval, outputsize) for sym in symbols}
+        now = time.time()
+        last = {}  # stale symbol -> stored last_epoch
+        for sym, s in series.items():
+            with s.lock:
+                if not (now < s.expires_at and s.last_epoch is not None):
+                    last[sym] = s.last_epoch
+        if not last:
+            return series
+        need = {sym: series[sym].missing_bars(now, last[sym]) for sym in last}
+        tail = [sym for sym in need if need[sym] < series[sym].capacity]
+        reload = [sym for sym in need if need[sym] >= series[sym].capacity]
+        if tail:
+            # sized when each chunk's credits are granted: the wait may cross a candle close
+            def size(chunk):
+                return max(series[x].missing_bars(time.time(), last[x]) for x in chunk)
+            for sym, o in fetch_ohlc_batch(tail, interval, size, priority=priority).items():
+                if not self._merge_fetched(series[sym], o, interval):
+                    reload.append(sym)
+        if reload:
+            size = max(series[x].capacity for x in reload)
+            for sym, o in fetch_ohlc_batch(reload, interval, size, priority=priority).items():
+                self._merge_fetched(series[sym], o, interval, reload=True)
+        return series
+
+    def _merge_fetched(self, s, o, interval, reload=False):
+        """Merge bars fetched without the lock; False if they do not meet the stored tail."""
+        with s.lock:
+            now = time.time()
+            if now < s.expires_at and s.last_epoch is not None:
+                return True  # refreshed by another caller meanwhile
+            if reload:
+                s.clear()
+            if not s.merge(o):
+                return False
+            s.expires_at = next_candle_close(interval, now)
+            self._persist(s, now)
+            return True
+
+candle_store = CandleStore()
+
+# -------------------- Resampling (higher timeframes from M1) --------------------
+# M5/M15/H1 bars are built from the M1 series already in memory, so
+# higher-timeframe confirmation needs no extra API calls. Buckets are aligned
+# to UTC candle boundaries (bucket open = epoch // tf * tf, as TwelveData
+# does); a leading bucket that starts before the stored window is dropped
+# because its open/high/low would be incomplete. The last bucket is the
+# forming one, like the last bar of a live time_series response.
+def resample_ohlc(epochs, o, tf_seconds):
+    out = {f: [] for f in OHLC_FIELDS}
+    bucket = None
+    for ep, op, hi, lo, cl, vol in zip(epochs, o["open"], o["high"], o["low"], o["close"], o["volume"]):
+        b = ep - ep % tf_seconds
+        if b != bucket:
+            if bucket is None and ep != b:
+                continue  # partial leading bucket
+            bucket = b
+            out["time"].append(b)
+            out["open"].append(op)
+            out["high"].append(hi)
+            out["low"].append(lo)
+            out["close"].append(cl)
+            out["volume"].append(vol)
+        else:
+            if hi > out["high"][-1]:
+                out["high"][-1] = hi
+            if lo < out["low"][-1]:
+                out["low"][-1] = lo
+            out["close"][-1] = cl
+            out["volume"][-1] += vol
+    return out
+
+def resample_series(series, tf, n=None):
+    """Bars of timeframe `tf` (a TF_SECONDS key) from the first n (default all)
+    bars of a lower-timeframe CandleSeries. Call with series.lock held."""
+    tf_seconds = TF_SECONDS[tf]
+    if tf_seconds % series.tf:
+        raise ValueError(f"cannot build {tf} bars from {series.interval} bars")
+    if n is None or n >= len(series):
+        return resample_ohlc(series.epochs, series.bars, tf_seconds)
+    return resample_ohlc(series.epochs[:n], {f: v[:n] for f, v in series.bars.items()}, tf_seconds)
+
 # -------------------- Indicators (pure python, efficient) --------------------
 def ema_list(prices, period):
     if len(prices) < period: return []
@@ -390,82 +930,264 @@ def psar_list(highs, lows, step=0.02, max_step=0.2):
             ep = lows[i]; af = min(af + step, max_step)
     return psar
 
-# -------------------- Evaluate logic --------------------
-REQUIRED_CONFIRMATIONS = 3  # configurable
+# -------------------- Streaming indicators (O(1) per candle) --------------------
+# Stateful versions of the list indicators above: seeded once by feeding the
+# history bar by bar, then updated with one value per closed candle. Each
+# update repeats the exact arithmetic of the list function, so the value
+# after N updates is bit-for-bit the last element of the list function run
+# over those N inputs.
+class _Stream:
+    def clone(self):
+        c = copy.copy(self)
+        for k, v in vars(c).items():
+            if isinstance(v, (list, _Stream)):
+                setattr(c, k, v.clone() if isinstance(v, _Stream) else list(v))
+        return c
+
+class EmaStream(_Stream):
+    def __init__(self, period):
+        self.period = period
+        self.k = 2.0 / (period + 1.0)
+        self.warmup = []
+        self.value = None
+
+    def update(self, price):
+        if self.value is None:
+            self.warmup.append(price)
+            if len(self.warmup) == self.period:
+                self.value = sum(self.warmup) / self.period
+                self.warmup = []
+            return self.value
+        self.value = price * self.k + self.value * (1 - self.k)
+        return self.value
+
+class RsiStream(_Stream):
+    def __init__(self, period=14):
+        self.period = period
+        self.prev_price = None
+        self.count = 0  # deltas seen
+        self.up = 0
+        self.down = 0
+        self.value = None
+
+    def update(self, price):
+        prev, self.prev_price = self.prev_price, price
+        if prev is None:
+            return None
+        delta = price - prev
+        self.count += 1
+        p = self.period
+        if self.count <= p:
+            if delta > 0:
+                self.up += delta
+            elif delta < 0:
+                self.down += delta
+            if self.count < p:
+                return None
+            self.up = self.up / p
+            self.down = -self.down / p
+        else:
+            self.up = (self.up * (p - 1) + max(delta, 0)) / p
+            self.down = (self.down * (p - 1) + max(-delta, 0)) / p
+        rs = self.up / (self.down if self.down != 0 else 1e-9)
+        self.value = 100. - 100. / (1. + rs)
+        return self.value
+
+class MacdStream(_Stream):
+    def __init__(self, fast=12, slow=26, signal=9):
+        self.fast = EmaStream(fast)
+        self.slow = EmaStream(slow)
+        self.signal = EmaStream(signal)
+        self.macd = None
+        self.sig = None
+        self.hist = None
+
+    def update(self, price):
+        ef = self.fast.update(price)
+        es = self.slow.update(price)
+        if ef is None or es is None:
+            return self.macd, self.sig, self.hist
+        self.macd = ef - es
+        self.sig = self.signal.update(self.macd)
+        self.hist = None if self.sig is None else self.macd - self.sig
+        return self.macd, self.sig, self.hist
+
+class AtrStream(_Stream):
+    def __init__(self, period=14):
+        self.period = period
+        self.prev_close = None
+        self.warmup = []
+        self.value = None
+
+    def update(self, high, low, close):
+        prev, self.prev_close = self.prev_close, close
+        if prev is None:
+            return None
+        tr = max(high - low, abs(high - prev), abs(low - prev))
+        if self.value is None:
+            self.warmup.append(tr)
+            if len(self.warmup) == self.period:
+                self.value = sum(self.warmup) / self.period
+                self.warmup = []
+            return self.value
+        self.value = (self.value * (self.period - 1) + tr) / self.period
+        return self.value
+
+class PsarStream(_Stream):
+    def __init__(self, step=0.02, max_step=0.2):
+        self.step = step
+        self.max_step = max_step
+        self.count = 0
+        self.psar = None
+        self.up = True
+        self.af = step
+        self.ep = None
+
+    @property
+    def value(self):
+        # psar_list returns all None until it has two bars
+        return self.psar if self.count >= 2 else None
+
+    def update(self, high, low):
+        self.count += 1
+        if self.count == 1:
+            self.ep = high
+            self.psar = low - (high - low)
+            return None
+        prev = self.psar
+        if self.up:
+            self.psar = prev + self.af * (self.ep - prev)
+            if low < self.psar:
+                self.up = False
+                self.psar = self.ep
+                self.af = self.step
+                self.ep = low
+        else:
+            self.psar = prev - self.af * (prev - self.ep)
+            if high > self.psar:
+                self.up = True
+                self.psar = self.ep
+                self.af = self.step
+                self.ep = high
+        if self.up and high > self.ep:
+            self.ep = high; self.af = min(self.af + self.step, self.max_step)
+        if (not self.up) and low < self.ep:
+            self.ep = low; self.af = min(self.af + self.step, self.max_step)
+        return self.psar
+
+class IndicatorSet:
+    """Streams for one CandleSeries. Closed bars are committed once; the last
+    (still forming) bar is applied to throwaway clones on every snapshot."""
+    def __init__(self):
+        self.ema_fast = EmaStream(EMA_FAST)
+        self.ema_slow = EmaStream(EMA_SLOW)
+        self.macd = MacdStream(MACD_FAST, MACD_SLOW, MACD_SIGNAL)
+        self.rsi = RsiStream(RSI_PERIOD)
+        self.atr = AtrStream(ATR_PERIOD)
+        self.psar = PsarStream(PSAR_STEP, PSAR_MAX)
+        self.committed_epoch = None
+        self.before = None  # macd_hist/rsi before the last committed bar
+
+    def _push(self, high, low, close):
+        self.ema_fast.update(close)
+        self.ema_slow.update(close)
+        self.macd.update(close)
+        self.rsi.update(close)
+        self.atr.update(high, low, close)
+        self.psar.update(high, low)
+
+    def sync(self, series):
+        """Commit every bar of `series` newer than the last commit, except the last one."""
+        b = series.bars
+        n = len(series)
+        i = n - 1
+        while i > 0 and (self.committed_epoch is None or series.epochs[i - 1] > self.committed_epoch):
+            i -= 1
+        for j in range(i, n - 1):
+            self.before = {"macd_hist": self.macd.hist, "rsi": self.rsi.value}
+            self._push(b["high"][j], b["low"][j], b["close"][j])
+            self.committed_epoch = series.epochs[j]
+
+    def snapshot(self, series, skip_last=False):
+        """Indicator values with the forming bar included (now) and excluded (prev).
+        With skip_last the last bar is left out: now is the last committed
+        bar, prev the one before it."""
+        self.sync(series)
+        if skip_last:
+            return {
+                "ema_fast": self.ema_fast.value, "ema_slow": self.ema_slow.value,
+                "macd_hist": self.macd.hist, "macd_hist_prev": self.before["macd_hist"],
+                "rsi": self.rsi.value, "rsi_prev": self.before["rsi"],
+                "atr": self.atr.value, "psar": self.psar.value,
+            }
+        b = series.bars
+        prev = {"macd_hist": self.macd.hist, "rsi": self.rsi.value}
+        ef, es, macd, rsi, atr, psar = (self.ema_fast.clone(), self.ema_slow.clone(), self.macd.clone(),
+                                         self.rsi.clone(), self.atr.clone(), self.psar.clone())
+        high, low, close = b["high"][-1], b["low"][-1], b["close"][-1]
+        ef.update(close); es.update(close); macd.update(close); rsi.update(close)
+        atr.update(high, low, close); psar.update(high, low)
+        return {
+            "ema_fast": ef.value, "ema_slow": es.value,
+            "macd_hist": macd.hist, "macd_hist_prev": prev["macd_hist"],
+            "rsi": rsi.value, "rsi_prev": prev["rsi"],
+            "atr": atr.value, "psar": psar.value,
+        }
 
-def evaluate_signal(symbol):
+# -------------------- Evaluate logic --------------------
+@EVALUATE_SECONDS.timed()
+def evaluate_signal(symbol, closed=False, refresh=True):
+    """closed=True when called just after a candle close (universe scan): the
+    decision is made on the bar that just closed, and the new bar, a couple
+    of seconds old, is ignored (as in core/backtest.py). refresh=False uses
+    the series as stored (the caller has just refreshed it)."""
     try:
-        o = fetch_ohlc(symbol, interval=PRIMARY_INTERVAL, outputsize=250)
+        if refresh:
+            series = candle_store.refresh(symbol, PRIMARY_INTERVAL, 250)
+        else:
+            series = candle_store.get_series(symbol, PRIMARY_INTERVAL, 250)
     except Exception as e:
         return {"error": f"data error: {e}"}
 
-    highs = o["high"]; lows = o["low"]; closes = o["close"]; opens = o["open"]
-    n = len(closes)
-    if n < max(RSI_PERIOD + 5, EMA_SLOW + 5, MACD_SLOW + 5):
-        return {"error": "not enough data"}
-
-    ema_fast = ema_list(closes, EMA_FAST)
-    ema_slow = ema_list(closes, EMA_SLOW)
-    macd_line, macd_sig, macd_hist = macd_list(closes, MACD_FAST, MACD_SLOW, MACD_SIGNAL)
-    rsi_vals = rsi_list(closes, RSI_PERIOD)
-    atr_vals = atr_list(highs, lows, closes, ATR_PERIOD)
-    psar_vals = psar_list(highs, lows, PSAR_STEP, PSAR_MAX)
-
-    def g(lst, idx):
-        try: return lst[idx]
-        except: return None
-
-    ema_fast_now = g(ema_fast, -1); ema_slow_now = g(ema_slow, -1)
-    macd_hist_now = g(macd_hist, -1); macd_hist_prev = g(macd_hist, -2)
-    rsi_now = g(rsi_vals, -1); rsi_prev = g(rsi_vals, -2)
-    atr_now = g(atr_vals, -1); psar_now = g(psar_vals, -1)
-    close_now = closes[-1]
-
-    ema_bull = ema_fast_now and ema_slow_now and ema_fast_now > ema_slow_now
-    ema_bear = ema_fast_now and ema_slow_now and ema_fast_now < ema_slow_now
-    macd_bull = macd_hist_now is not None and macd_hist_prev is not None and macd_hist_now > 0 and macd_hist_now > macd_hist_prev
-    macd_bear = macd_hist_now is not None and macd_hist_prev is not None and macd_hist_now < 0 and macd_hist_now < macd_hist_prev
-    rsi_bull = rsi_now is not None and rsi_prev is not None and rsi_now < 40 and rsi_now > rsi_prev
-    rsi_bear = rsi_now is not None and rsi_prev is not None and rsi_now > 60 and rsi_now < rsi_prev
-    psar_bull = psar_now is not None and psar_now < close_now
-    psar_bear = psar_now is not None and psar_now > close_now
-
-    atr_gate = True
-    if atr_now and close_now > 0:
-        atr_ratio = atr_now / close_now
-        if atr_ratio < 0.0003:
-            atr_gate = False
-
-    bull_conf = sum([bool(ema_bull), bool(macd_bull), bool(rsi_bull), bool(psar_bull), bool(atr_gate)])
-    bear_conf = sum([bool(ema_bear), bool(macd_bear), bool(rsi_bear), bool(psar_bear), bool(atr_gate)])
+    with series.lock:
+        skip = 1 if closed and series.last_epoch is not None and series.last_epoch + series.tf > time.time() else 0
+        n = len(series) - skip
+        if n < max(RSI_PERIOD + 5, EMA_SLOW + 5, MACD_SLOW + 5):
+            return {"error": "not enough data"}
+        if series.indicators is None:
+            series.indicators = IndicatorSet()
+        ind = series.indicators.snapshot(series, skip_last=bool(skip))
+        close_now = series.views["close"][series.end - 1 - skip]
+        o5 = resample_series(series, SECONDARY_TF, n) if USE_M5_CONFIRM else None
+
+    ema_fast_now = ind["ema_fast"]; ema_slow_now = ind["ema_slow"]
+    macd_hist_now = ind["macd_hist"]; macd_hist_prev = ind["macd_hist_prev"]
+    rsi_now = ind["rsi"]; rsi_prev = ind["rsi_prev"]
+    atr_now = ind["atr"]; psar_now = ind["psar"]
+
+    flags, bull_conf, bear_conf = confluence(ema_fast_now, ema_slow_now, macd_hist_now, macd_hist_prev,
+                                             rsi_now, rsi_prev, atr_now, psar_now, close_now)
 
     # m5 confirmation
     m5_ok = True
     if USE_M5_CONFIRM:
         try:
-            o5 = fetch_ohlc(symbol, interval=SECONDARY_INTERVAL, outputsize=120)
             closes5 = o5["close"]
             ema5_fast = ema_list(closes5, EMA_FAST); ema5_slow = ema_list(closes5, EMA_SLOW)
-            if ema5_fast and ema5_slow and ema5_fast[-1] and ema5_slow[-1]:
-                if bull_conf > bear_conf:
-                    m5_ok = ema5_fast[-1] > ema5_slow[-1]
-                elif bear_conf > bull_conf:
-                    m5_ok = ema5_fast[-1] < ema5_slow[-1]
-                else:
-                    m5_ok = True
+            if ema5_fast and ema5_slow:
+                m5_ok = higher_tf_ok(ema5_fast[-1], ema5_slow[-1], bull_conf, bear_conf)
         except Exception:
             m5_ok = True
 
-    decision = None; confidence = None
     def conf_score(c):
         return min(98, int(50 + c * 10 + random.randint(0,4)))
 
-    if bull_conf >= REQUIRED_CONFIRMATIONS and bull_conf > bear_conf and m5_ok:
-        decision = "BUY"; confidence = conf_score(bull_conf)
-    elif bear_conf >= REQUIRED_CONFIRMATIONS and bear_conf > bull_conf and m5_ok:
-        decision = "SELL"; confidence = conf_score(bear_conf)
-    else:
-        decision = None
+    decision = decide(bull_conf, bear_conf, m5_ok)
+    confidence = None
+    if decision == "BUY":
+        confidence = conf_score(bull_conf)
+    elif decision == "SELL":
+        confidence = conf_score(bear_conf)
 
     # schedule entry at next minute mark (UTC -> convert to WAT for messaging)
     now = datetime.utcnow()
@@ -473,25 +1195,21 @@ def evaluate_signal(symbol):
     entry_time_wat = next_minute_utc + timedelta(hours=1)
 
     analysis = []
-    if ema_bull: analysis.append("EMA fast>slow")
-    if macd_bull: analysis.append("MACD hist rising")
-    if rsi_bull: analysis.append("RSI rising from low")
-    if psar_bull: analysis.append("PSAR below price")
-    if not atr_gate: analysis.append("Low ATR")
-    if ema_bear: analysis.append("EMA fast<slow")
-    if macd_bear: analysis.append("MACD hist falling")
-    if rsi_bear: analysis.append("RSI dropping")
-    if psar_bear: analysis.append("PSAR above price")
+    if flags["ema_bull"]: analysis.append("EMA fast>slow")
+    if flags["macd_bull"]: analysis.append("MACD hist rising")
+    if flags["rsi_bull"]: analysis.append("RSI rising from low")
+    if flags["psar_bull"]: analysis.append("PSAR below price")
+    if not flags["atr_gate"]: analysis.append("Low ATR")
+    if flags["ema_bear"]: analysis.append("EMA fast<slow")
+    if flags["macd_bear"]: analysis.append("MACD hist falling")
+    if flags["rsi_bear"]: analysis.append("RSI dropping")
+    if flags["psar_bear"]: analysis.append("PSAR above price")
 
     return {
         "signal": decision,
         "confidence": confidence,
         "confirms_count": max(bull_conf, bear_conf),
-        "confirms": {
-            "ema_bull": bool(ema_bull), "macd_bull": bool(macd_bull), "rsi_bull": bool(rsi_bull), "psar_bull": bool(psar_bull),
-            "ema_bear": bool(ema_bear), "macd_bear": bool(macd_bear), "rsi_bear": bool(rsi_bear), "psar_bear": bool(psar_bear),
-            "atr_gate": atr_gate, "m5_ok": m5_ok
-        },
+        "confirms": dict(flags, m5_ok=m5_ok),
         "analysis": "; ".join(analysis) if analysis else "No confluence",
         "entry_time_wat": entry_time_wat,
         "price": close_now,
@@ -499,28 +1217,215 @@ def evaluate_signal(symbol):
     }
 
 # -------------------- Logging & CSV --------------------
+# log_signal only queues the row; a background thread writes queued rows in
+# batches (every CSV_FLUSH_SECONDS or CSV_BATCH_MAX rows, whichever first)
+# and, when the WAT day changes, renames signals.csv to
+# signals-YYYY-MM-DD.csv and starts a new file.
 SIGNALS_CSV = os.path.join(LOG_DIR, "signals.csv")
-def ensure_csv():
-    if not os.path.exists(SIGNALS_CSV):
-        with open(SIGNALS_CSV, "w", newline="") as f:
-            w = csv.writer(f)
-            w.writerow(["timestamp_wat","asset","signal","confidence","price","analysis","confirms","meta","result","result_time_wat"])
+CSV_HEADER = ["timestamp_wat","asset","signal","confidence","price","analysis","confirms","meta","result","result_time_wat"]
+CSV_FLUSH_SECONDS = float(os.getenv("CSV_FLUSH_SECONDS", "1"))
+CSV_BATCH_MAX = int(os.getenv("CSV_BATCH_MAX", "200"))
+
+class CsvLogWriter:
+    def __init__(self, path, header, flush_seconds=CSV_FLUSH_SECONDS, batch_max=CSV_BATCH_MAX):
+        self.path = path
+        self.header = header
+        self.flush_seconds = flush_seconds
+        self.batch_max = batch_max
+        self.queue = queue.Queue()
+        self.file = None
+        self.writer = None
+        self.day = None
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def write(self, row):
+        """Queue one row; never blocks on file I/O."""
+        if self.thread is None:
+            self.start()
+        self.queue.put(row)
+
+    def start(self):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="csv-writer", daemon=True)
+                self.thread.start()
+
+    def flush(self):
+        """Wait until every queued row is on disk."""
+        self.queue.join()
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.flush_seconds
+            while len(batch) < self.batch_max:
+                wait = deadline - time.monotonic()
+                if wait <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=wait))
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+            except Exception as e:
+                logger.warning("Writing %s rows to %s failed: %s", len(batch), self.path, e)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def _day_of(self, ts):
+        return (datetime.fromtimestamp(ts, UTC) + timedelta(hours=1)).date()
+
+    def _write(self, rows):
+        today = now_wat().date()
+        if self.file is not None and today != self.day:
+            self.file.close()
+            self.file = None
+            self._rotate()
+        if self.file is None:
+            if os.path.exists(self.path) and self._day_of(os.path.getmtime(self.path)) != today:
+                self.day = self._day_of(os.path.getmtime(self.path))
+                self._rotate()
+            new = not os.path.exists(self.path)
+            self.file = open(self.path, "a", newline="")
+            self.writer = csv.writer(self.file)
+            self.day = today
+            if new:
+                self.writer.writerow(self.header)
+        self.writer.writerows(rows)
+        self.file.flush()
+
+    def _rotate(self):
+        root, ext = os.path.splitext(self.path)
+        target = f"{root}-{self.day.isoformat()}{ext}"
+        n = 1
+        while os.path.exists(target):  # never overwrite an earlier archive
+            target = f"{root}-{self.day.isoformat()}.{n}{ext}"
+            n += 1
+        os.replace(self.path, target)
+
+signal_csv = CsvLogWriter(SIGNALS_CSV, CSV_HEADER)
+atexit.register(signal_csv.flush)
+
+# The signal journal (core/signal_journal.py) is the record statistics are
+# built from: one indexed row per signal, its result set in place. The CSV
+# above stays as a plain-text audit log.
+SIGNAL_DB = os.getenv("SIGNAL_DB", os.path.join(LOG_DIR, "signals.db"))
+journal = SignalJournal(SIGNAL_DB)
+_signal_seq = itertools.count()
+
+def new_signal_id():
+    """Unique, roughly time-ordered id shown in the alerts and used as the journal key."""
+    return f"#LX-{int(time.time()):X}{next(_signal_seq) % 256:02X}"
 
 def log_signal(asset, info, result=None):
-    ensure_csv()
-    ts = now_wat().strftime("%Y-%m-%d %H:%M:%S")
-    row = [ts, asset, info.get("signal"), info.get("confidence"), info.get("price"), info.get("analysis"), info.get("confirms_count"), json.dumps(info.get("meta")), result or "", now_wat().strftime("%Y-%m-%d %H:%M:%S") if result else ""]
-    with open(SIGNALS_CSV, "a", newline="") as f:
-        w = csv.writer(f)
-        w.writerow(row)
+    ts = fmt_wat()
+    signal_csv.write([ts, asset, info.get("signal"), info.get("confidence"), info.get("price"), info.get("analysis"), info.get("confirms_count"), json.dumps(info.get("meta")), result or "", ts if result else ""])
 
 # -------------------- Scheduler utilities --------------------
+# All timed alerts go through one AlertScheduler: a single thread sleeping on
+# a min-heap of (fire_at, seq, job) entries, instead of one threading.Timer
+# (an OS thread with its own stack) per message. Due jobs run on a small
+# fixed pool so a slow broadcast never delays the next alert. Cancelled jobs
+# stay in the heap as tombstones and are skipped when popped; the heap is
+# rebuilt when they pile up.
+ALERT_QUEUE_MAX = int(os.getenv("ALERT_QUEUE_MAX", "1000"))  # pending alerts before new ones are refused
+ALERT_WORKERS = int(os.getenv("ALERT_WORKERS", "2"))
+
+class SchedulerFull(RuntimeError):
+    pass
+
+class AlertScheduler:
+    def __init__(self, max_pending=ALERT_QUEUE_MAX, workers=ALERT_WORKERS):
+        self.max_pending = max_pending
+        self.heap = []  # [fire_at, seq, job]; job is None once cancelled
+        self.jobs = {}  # seq -> heap entry, live jobs only
+        self.seq = itertools.count(1)
+        self.cond = threading.Condition()
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="alert")
+        self.thread = None
+
+    def __len__(self):
+        return len(self.jobs)
+
+    def start(self):
+        with self.cond:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="alert-scheduler", daemon=True)
+                self.thread.start()
+
+    def schedule(self, delay, fn, name="", tag=None):
+        """Run fn() after `delay` seconds; returns the job id. Raises SchedulerFull
+        when max_pending jobs are already waiting."""
+        with self.cond:
+            if len(self.jobs) >= self.max_pending:
+                raise SchedulerFull(f"{len(self.jobs)} alerts pending")
+            job_id = next(self.seq)
+            entry = [time.time() + max(0, delay), job_id, {"fn": fn, "name": name, "tag": tag}]
+            self.jobs[job_id] = entry
+            heapq.heappush(self.heap, entry)
+            if self.heap[0] is entry:
+                self.cond.notify()
+        self.start()
+        return job_id
+
+    def cancel(self, job_id):
+        with self.cond:
+            entry = self.jobs.pop(job_id, None)
+            if entry is None:
+                return False
+            entry[2] = None
+            self._compact()
+            return True
+
+    def cancel_tag(self, tag):
+        """Cancel every pending job scheduled with `tag`; returns how many."""
+        with self.cond:
+            ids = [job_id for job_id, e in self.jobs.items() if e[2]["tag"] == tag]
+            for job_id in ids:
+                self.jobs.pop(job_id)[2] = None
+            self._compact()
+            return len(ids)
+
+    def _compact(self):
+        if len(self.heap) > 2 * len(self.jobs) + 16:
+            self.heap = [e for e in self.heap if e[2] is not None]
+            heapq.heapify(self.heap)
+
+    def pending(self):
+        """[(fire_at, job_id, name, tag)] of the jobs still waiting, soonest first."""
+        with self.cond:
+            return sorted((e[0], e[1], e[2]["name"], e[2]["tag"]) for e in self.jobs.values())
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while True:
+                    while self.heap and self.heap[0][2] is None:
+                        heapq.heappop(self.heap)
+                    wait = self.heap[0][0] - time.time() if self.heap else None
+                    if wait is not None and wait <= 0:
+                        break
+                    self.cond.wait(wait)
+                fire_at, job_id, job = heapq.heappop(self.heap)
+                del self.jobs[job_id]
+            self.pool.submit(self._fire, job)
+
+    @staticmethod
+    def _fire(job):
+        try:
+            job["fn"]()
+        except Exception as e:
+            logger.exception("Alert %s (%s) failed: %s", job["name"], job["tag"], e)
+
+alert_scheduler = AlertScheduler()
+
 def seconds_into_candle(tf_seconds):
     s = int(time.time())
     return s % tf_seconds
 
-TF_SECONDS = {"M1": 60, "M5": 300, "M15": 900, "H1": 3600}
-
 def schedule_alerts(payload, tf="M1"):
     """
     Schedule 3 messages relative to current candle:
@@ -577,35 +1482,238 @@ def schedule_alerts(payload, tf="M1"):
                      f"{analysis}\n\n{signal_id}\n{BOT_TAGLINE}")
         broadcast(entry_msg, parse_mode="Markdown")
 
-    # schedule threads
-    threading.Timer(int(pre_delay), send_pre).start()
-    threading.Timer(int(confirm_delay), send_confirm).start()
-    threading.Timer(int(entry_delay), send_entry).start()
+    # all three or none: a refused entry must not leave its pre-alert behind
+    try:
+        alert_scheduler.schedule(int(pre_delay), send_pre, "pre-alert", signal_id)
+        alert_scheduler.schedule(int(confirm_delay), send_confirm, "confirmation", signal_id)
+        alert_scheduler.schedule(int(entry_delay), send_entry, "entry", signal_id)
+    except SchedulerFull:
+        alert_scheduler.cancel_tag(signal_id)
+        raise
 
 # -------------------- Signal engine (scans assets and broadcasts) --------------------
+# Four stages, each on its own thread, joined by queues:
+#   scan     - evaluates assets at each candle close and queues the picks
+#   schedule - schedules the alerts, logs the signal and queues its result
+#   resolve  - at each candle close settles every result whose expiry passed
+#   report   - broadcasts and logs the settled results
+# (TradingView alerts from /webhook have their own stage, webhook_stage.)
+# No stage waits on another's timers: scanning goes on while any number of
+# signals wait for their expiry candle. An asset that just signalled sits
+# out until POST_GAP_MIN..POST_GAP_MAX seconds after its expiry; the other
+# assets keep being scanned.
 RECENT_ASSETS_MAX = 6
 recent_assets = []
-
-def signal_loop():
+signal_queue = queue.Queue()  # (asset, info) picks from the scan stage
+result_queue = queue.Queue()  # (signal_id, asset, info, result, entry_price, exit_price)
+cooldown_until = {}  # asset -> epoch before which it is not signalled again
+
+# "universe": at each candle close score as many assets as the credit budget
+# allows (rotating through ASSETS) and send the best SCAN_TOP_N; "random":
+# the original one-random-asset-at-a-time loop.
+SCAN_MODE = os.getenv("SCAN_MODE", "universe")
+SCAN_WORKERS = int(os.getenv("SCAN_WORKERS", "4"))
+SCAN_TOP_N = int(os.getenv("SCAN_TOP_N", "1"))
+SCAN_SETTLE_SECONDS = int(os.getenv("SCAN_SETTLE_SECONDS", "2"))  # let the closed bar reach the API
+# credits per minute left for result lookups: a universe scan takes the rest,
+# so on a small plan each candle scans the next few ASSETS in rotation
+SCAN_RESERVE_CREDITS = int(os.getenv("SCAN_RESERVE_CREDITS", str(SCAN_TOP_N)))
+MIN_CONFIDENCE = 60
+
+_scan_pool = ThreadPoolExecutor(max_workers=SCAN_WORKERS, thread_name_prefix="scan")
+
+def available_assets(now=None):
+    now = time.time() if now is None else now
+    return [a for a in ASSETS if cooldown_until.get(a, 0) <= now]
+
+def claim_asset(asset):
+    """Take `asset` out of the scan as soon as it is queued. emit_signal sets
+    the real cooldown on the schedule thread; until then the same bar must
+    not be picked and queued again."""
+    cooldown_until[asset] = max(cooldown_until.get(asset, 0), next_candle_close(PRIMARY_INTERVAL) + 60)
+
+def is_candidate(info):
+    return (not info.get("error") and info.get("signal")
+            and info.get("confidence") is not None and info["confidence"] >= MIN_CONFIDENCE)
+
+_scan_cursor = 0  # index in ASSETS where the next universe scan starts
+
+def next_scan_assets(assets):
+    """The assets (of `assets`) to scan this candle: as many as one request
+    within the credit budget can cover, continuing through ASSETS from where
+    the last scan stopped so every asset gets its turn."""
+    global _scan_cursor
+    limit = max(1, min(TD_MAX_BATCH, td_budget.limit - SCAN_RESERVE_CREDITS))
+    wanted = set(assets)
+    order = [ASSETS[(_scan_cursor + i) % len(ASSETS)] for i in range(len(ASSETS))]
+    picked = [a for a in order if a in wanted][:limit]
+    if picked:
+        _scan_cursor = (ASSETS.index(picked[-1]) + 1) % len(ASSETS)
+    return picked
+
+def scan_universe(assets=None, top_n=SCAN_TOP_N):
+    """Evaluate this candle's share of the assets concurrently; return the best (asset, info) pairs."""
+    assets = next_scan_assets(assets or ASSETS)
+    # one batched refresh, then every evaluate_signal reads from memory
+    try:
+        candle_store.refresh_many(assets, PRIMARY_INTERVAL, 250)
+    except Exception as e:
+        logger.info("Batch refresh failed, skipping this candle's scan: %s", e)
+        return []
+    # runs just after a close: evaluate the bar that closed, not the new one
+    results = list(zip(assets, _scan_pool.map(lambda a: evaluate_signal(a, closed=True, refresh=False), assets)))
+    for asset, info in results:
+        if info.get("error"):
+            logger.info("Data error for %s: %s", asset, info["error"])
+    ranked = sorted((r for r in results if is_candidate(r[1])),
+                    key=lambda r: (r[1]["confirms_count"], r[1]["confidence"]), reverse=True)
+    logger.info("Scanned %s assets, %s candidates", len(assets), len(ranked))
+    return ranked[:top_n]
+
+def sleep_until_candle_close(interval=PRIMARY_INTERVAL):
+    time.sleep(max(0, next_candle_close(interval) - time.time()) + SCAN_SETTLE_SECONDS)
+
+def pick_random_asset():
+    assets = available_assets() or ASSETS
+    for _ in range(12):
+        cand = random.choice(assets)
+        if cand not in recent_assets:
+            return cand
+    return random.choice(assets)
+
+def emit_signal(asset, info):
     global recent_assets
-    logger.info("Signal engine started")
+    # We have a candidate: schedule pre/confirm/entry using schedule_alerts (which aligns to candle)
+    payload = {
+        "signal_id": new_signal_id(),
+        "symbol": asset,
+        "direction": info["signal"],
+        "confidence": info["confidence"],
+        "analysis": info["analysis"],
+        "timeframe": "M1"
+    }
+    schedule_alerts(payload, tf="M1")
+    SIGNALS.inc(asset=asset, source="engine")
+    # entry is the next candle open (see schedule_alerts); settle on that candle
+    entry_epoch = next_candle_close(PRIMARY_INTERVAL)
+    log_signal(asset, info)  # log the signal
+    journal.record_signal(payload["signal_id"], asset, info, entry_ts=entry_epoch)
+    queue_result(payload["signal_id"], asset, info, entry_epoch)
+    cooldown_until[asset] = entry_epoch + 60 + random.randint(POST_GAP_MIN, POST_GAP_MAX)
+
+    # remember asset
+    recent_assets.append(asset)
+    if len(recent_assets) > RECENT_ASSETS_MAX:
+        recent_assets = recent_assets[-RECENT_ASSETS_MAX:]
+    return payload
+
+def report_result(signal_id, asset, info, result, entry_price=None, exit_price=None):
+    result_text = {"WIN": "✅ WIN", "LOSS": "❌ LOSS", "DRAW": "➖ DRAW"}[result]
+    summary = {"WIN": "Momentum held — trade closed in profit.",
+               "LOSS": "Market reversed — loss.",
+               "DRAW": "Price closed at the entry level."}[result]
+    prices = f"\n📈 Entry {entry_price:g} → Expiry {exit_price:g}" if entry_price is not None else ""
+    broadcast(f"{result_text} — {asset} ({info['signal']})\n🎯 Confidence: {info.get('confidence')}%{prices}\n{summary}", parse_mode="Markdown")
+    log_signal(asset, info, result=result_text)
+    journal.record_result(signal_id, result, entry_price, exit_price)
+
+# -------------------- Result resolution --------------------
+# A signal enters at the open of the candle after it is sent and expires at
+# that candle's close (M1 expiry). Open signals wait in `pending_results`;
+# once their expiry has passed, resolve_results() refreshes every asset
+# involved with one batched request (series already refreshed this candle,
+# e.g. by the universe scan, cost nothing) and settles each signal from the
+# real entry candle: WIN if it closed in the signal direction.
+RESULT_MAX_WAIT = int(os.getenv("RESULT_MAX_WAIT", "600"))  # seconds past expiry before a result is dropped
+pending_results = []
+_pending_lock = threading.Lock()
+
+def queue_result(signal_id, asset, info, entry_epoch, tf_seconds=60):
+    with _pending_lock:
+        pending_results.append({"signal_id": signal_id, "asset": asset, "info": info,
+                                "entry_epoch": entry_epoch, "expiry_epoch": entry_epoch + tf_seconds})
+
+def reload_pending_results(now=None):
+    """Re-queue the signals the journal still has open after a restart
+    (pending_results only lives in memory). Those whose expiry is more than
+    RESULT_MAX_WAIT ago are voided instead of reported late."""
+    now = time.time() if now is None else now
+    requeued = voided = 0
+    for signal_id, asset, entry_ts, info in journal.pending():
+        if entry_ts is None or now - (entry_ts + 60) > RESULT_MAX_WAIT:
+            journal.record_result(signal_id, "VOID")
+            voided += 1
+        else:
+            queue_result(signal_id, asset, info, entry_ts)
+            requeued += 1
+    if requeued or voided:
+        logger.info("Journal: %s open signals re-queued, %s voided", requeued, voided)
+
+def settle(direction, entry_price, exit_price):
+    move = exit_price - entry_price
+    if direction == "SELL":
+        move = -move
+    return "WIN" if move > 0 else "LOSS" if move < 0 else "DRAW"
+
+def resolve_results(now=None):
+    """Settle every pending signal whose expiry candle has closed; returns how many were settled."""
+    now = time.time() if now is None else now
+    with _pending_lock:
+        due = [p for p in pending_results if p["expiry_epoch"] <= now]
+    if not due:
+        return 0
+    symbols = sorted({p["asset"] for p in due})
+    try:
+        candle_store.refresh_many(symbols, PRIMARY_INTERVAL, 250, priority=PRIORITY_RESULT)
+    except Exception as e:
+        logger.warning("Result lookup for %s failed, retrying next candle: %s", symbols, e)
+        return 0
+
+    done = []
+    for p in due:
+        s = candle_store.get_series(p["asset"], PRIMARY_INTERVAL)
+        with s.lock:
+            # the series was fetched after the expiry (its cache expires at each close),
+            # so the entry candle's close is final
+            bar = s.bar_at(p["entry_epoch"])
+        if bar is None:
+            if now - p["expiry_epoch"] > RESULT_MAX_WAIT:
+                logger.warning("No entry candle for %s %s, dropping result", p["signal_id"], p["asset"])
+                journal.record_result(p["signal_id"], "VOID")
+                done.append(p)
+            continue
+        result = settle(p["info"]["signal"], bar["open"], bar["close"])
+        result_queue.put((p["signal_id"], p["asset"], p["info"], result, bar["open"], bar["close"]))
+        done.append(p)
+    settled = {id(p) for p in done}
+    with _pending_lock:
+        pending_results[:] = [p for p in pending_results if id(p) not in settled]
+    logger.info("Resolved %s of %s due results (%s assets, %s pending)",
+                len(done), len(due), len(symbols), len(pending_results))
+    return len(done)
+
+def scan_stage():
+    logger.info("Scan stage started (SCAN_MODE=%s)", SCAN_MODE)
     while True:
-        approved = get_approved_subs()
-        if not approved:
+        if not has_approved_subs():
             logger.info("No approved users, sleeping 60s")
             time.sleep(60)
             continue
 
-        asset = None
-        tries = 0
-        while tries < 12:
-            cand = random.choice(ASSETS)
-            if cand not in recent_assets:
-                asset = cand; break
-            tries += 1
-        if not asset:
-            asset = random.choice(ASSETS)
+        if SCAN_MODE == "universe":
+            sleep_until_candle_close()
+            assets = available_assets()
+            if not assets:
+                continue
+            for pick in scan_universe(assets):
+                claim_asset(pick[0])
+                signal_queue.put(pick)
+            continue
 
+        if not available_assets():
+            time.sleep(6)
+            continue
+        asset = pick_random_asset()
         logger.info("Scanning %s", asset)
         info = evaluate_signal(asset)
         if info.get("error"):
@@ -619,77 +1727,171 @@ def signal_loop():
             continue
 
         # Confidence gate
-        if info.get("confidence") is None or info.get("confidence") < 60:
+        if not is_candidate(info):
             logger.info("Low confidence %s for %s", info.get("confidence"), asset)
             time.sleep(6)
             continue
+        claim_asset(asset)
+        signal_queue.put((asset, info))
 
-        # We have a candidate: schedule pre/confirm/entry using schedule_alerts (which aligns to candle)
-        payload = {
-            "signal_id": f"#LX-{random.randint(1000,9999)}",
-            "symbol": asset,
-            "direction": info["signal"],
-            "confidence": info["confidence"],
-            "analysis": info["analysis"],
-            "timeframe": "M1"
-        }
-        schedule_alerts(payload, tf="M1")
-        ensure_csv()
-        log_signal(asset, info)  # log the signal
-
-        # remember asset
-        recent_assets.append(asset)
-        if len(recent_assets) > RECENT_ASSETS_MAX:
-            recent_assets = recent_assets[-RECENT_ASSETS_MAX:]
-
-        # Wait for result window then broadcast result (simulate)
-        logger.info("Waiting %s seconds to evaluate result", RESULT_DELAY_SECONDS)
-        time.sleep(RESULT_DELAY_SECONDS)
-        is_win = random.random() < (info["confidence"] / 100.0)
-        result_text = "✅ WIN" if is_win else "❌ LOSS"
-        summary = "Momentum held — trade closed in profit." if is_win else "Market reversed — loss."
-        broadcast(f"{result_text} — {asset} ({info['signal']})\n🎯 Confidence: {info.get('confidence')}%\n{summary}", parse_mode="Markdown")
-        log_signal(asset, info, result=result_text)
-
-        # gap between scans
-        gap = random.randint(POST_GAP_MIN, POST_GAP_MAX)
-        logger.info("Sleeping %s seconds before next scan", gap)
-        time.sleep(gap)
+def schedule_stage():
+    while True:
+        asset, info = signal_queue.get()
+        try:
+            emit_signal(asset, info)
+        except SchedulerFull as e:
+            logger.warning("Alert queue full, dropping %s signal: %s", asset, e)
+        except Exception as e:
+            logger.exception("Scheduling %s failed: %s", asset, e)
+
+def resolve_stage():
+    while True:
+        sleep_until_candle_close()
+        try:
+            resolve_results()
+        except Exception as e:
+            logger.exception("Result resolution failed: %s", e)
+
+def report_stage():
+    while True:
+        item = result_queue.get()
+        try:
+            report_result(*item)
+        except Exception as e:
+            logger.exception("Reporting %s failed: %s", item[1], e)
+
+def start_engine():
+    reload_pending_results()
+    for stage in (scan_stage, schedule_stage, resolve_stage, report_stage, webhook_stage):
+        threading.Thread(target=stage, name=stage.__name__, daemon=True).start()
 
 # -------------------- Flask webhook endpoint --------------------
-# -------------------- Flask webhook endpoint --------------------
+# TradingView alerts are only checked and queued inside the request; the
+# webhook stage schedules them. Alerts already seen (same signal_id, or the
+# same payload when there is none) within WEBHOOK_DEDUPE_TTL are
+# acknowledged without queueing again, so retry storms schedule a signal
+# once. A full queue answers 503 so the sender retries later.
+WEBHOOK_QUEUE_MAX = int(os.getenv("WEBHOOK_QUEUE_MAX", "5000"))
+WEBHOOK_DEDUPE_TTL = int(os.getenv("WEBHOOK_DEDUPE_TTL", "600"))  # seconds
+WEBHOOK_DEDUPE_MAX = int(os.getenv("WEBHOOK_DEDUPE_MAX", "20000"))  # keys remembered
+
+class RecentKeys:
+    """Keys first seen in the last `ttl` seconds, at most `max_keys` of them.
+    A repeat does not refresh or reorder a key, so the dict stays in
+    first-seen order and expired keys are always at the front."""
+    def __init__(self, ttl, max_keys):
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self.keys = OrderedDict()  # key -> time first seen, oldest first
+        self.lock = threading.Lock()
+
+    def add(self, key, now=None):
+        """Remember `key`; returns False if it was already seen within the TTL."""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            while self.keys:
+                oldest, seen = next(iter(self.keys.items()))
+                if now - seen < self.ttl and len(self.keys) < self.max_keys:
+                    break
+                self.keys.popitem(last=False)
+            if key in self.keys:
+                return False
+            self.keys[key] = now
+            return True
+
+    def discard(self, key):
+        with self.lock:
+            self.keys.pop(key, None)
+
+webhook_queue = queue.Queue(maxsize=WEBHOOK_QUEUE_MAX)
+webhook_seen = RecentKeys(WEBHOOK_DEDUPE_TTL, WEBHOOK_DEDUPE_MAX)
+
+def webhook_key(payload):
+    if payload.get("signal_id"):
+        return "id:" + str(payload["signal_id"])
+    return "sha1:" + hashlib.sha1(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+def webhook_stage():
+    while True:
+        payload = webhook_queue.get()
+        try:
+            schedule_alerts(payload, tf=payload.get("timeframe", "M1"))
+            SIGNALS.inc(asset=payload.get("symbol", "UNKNOWN"), source="webhook")
+        except SchedulerFull as e:
+            logger.warning("Alert queue full, dropping /webhook signal %s: %s", payload.get("signal_id"), e)
+        except Exception as e:
+            logger.exception("Scheduling /webhook signal failed: %s", e)
+
 @app.route("/")
 def root():
     return "Lekzy Trade AI running", 200
 
 
+@app.route("/metrics")
+def metrics():
+    return REGISTRY.render(), 200, {"Content-Type": CONTENT_TYPE}
+
+
 @app.route("/webhook", methods=["POST"])
 def webhook():
-    # If Telegram uses webhook to send updates, or TradingView sends alerts
+    # TradingView style alerts; Telegram updates go to TELEGRAM_WEBHOOK_PATH
     try:
         payload = request.get_json(force=True)
     except Exception as e:
         logger.warning("Bad JSON on /webhook: %s", e)
         return jsonify({"ok": False, "error": "bad json"}), 400
 
-    # ... (rest of your webhook logic)
-    # if payload looks like a Telegram update (contains message/send)
-    # we let Telebot handle Telegram updates only when using getUpdates/polling.
-    # For webhook to Telegram, we'd need to forward to telebot (not used by default).
-    # Here we handle TradingView style calls:
     if isinstance(payload, dict) and ("symbol" in payload or "direction" in payload):
-        # schedule signal
-        tf = payload.get("timeframe", "M1")
-        schedule_alerts(payload, tf=tf)
+        key = webhook_key(payload)
+        if not webhook_seen.add(key):
+            return jsonify({"ok": True, "duplicate": True}), 200
+        try:
+            webhook_queue.put_nowait(payload)
+        except queue.Full:
+            webhook_seen.discard(key)  # not taken: let the retry in
+            return jsonify({"ok": False, "error": "busy"}), 503
         return jsonify({"ok": True}), 200
 
     # else if it's generic or from tests: just log and return OK
     logger.info("/webhook received payload: %s", json.dumps(payload)[:1000])
     return jsonify({"ok": True}), 200
 
+# -------------------- Telegram webhook --------------------
+# Telegram POSTs each update to a path containing the secret, and repeats the
+# secret in the X-Telegram-Bot-Api-Secret-Token header. The request only
+# checks both and hands the body to a worker pool, which deserializes it and
+# runs the handlers through bot.process_new_updates. No polling round trips,
+# and no 409 conflicts between instances: the last set_webhook wins.
+TELEGRAM_WEBHOOK_PATH = f"/telegram/{TELEGRAM_WEBHOOK_SECRET}"
+_update_pool = ThreadPoolExecutor(max_workers=UPDATE_WORKERS, thread_name_prefix="update")
+
+def process_update(body):
+    try:
+        bot.process_new_updates([telebot.types.Update.de_json(body)])
+    except Exception as e:
+        logger.exception("Telegram update failed: %s", e)
+
+@app.route(TELEGRAM_WEBHOOK_PATH, methods=["POST"])
+def telegram_webhook():
+    token = request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+    if not hmac.compare_digest(token, TELEGRAM_WEBHOOK_SECRET):
+        abort(403)
+    _update_pool.submit(process_update, request.get_data(as_text=True))
+    return "", 200
+
+def set_telegram_webhook():
+    url = WEBHOOK_URL + TELEGRAM_WEBHOOK_PATH
+    bot.remove_webhook()
+    bot.set_webhook(url=url, secret_token=TELEGRAM_WEBHOOK_SECRET, max_connections=40)
+    logger.info("Telegram webhook set to %s/telegram/...", WEBHOOK_URL)
+
 # -------------------- Start polling wrapper --------------------
 def polling_wrapper():
     # Keep polling; handle ApiTelegramException conflicts gracefully
+    try:
+        bot.remove_webhook()  # getUpdates is refused while a webhook is set
+    except Exception as e:
+        logger.warning("Could not remove webhook: %s", e)
     while True:
         try:
             logger.info("Starting TeleBot polling...")
@@ -716,48 +1918,22 @@ def main():
         except Exception:
             pass
 
-    # Start signal loop in background thread (only when running locally/polling or when you want it active)
-    t_signal = threading.Thread(target=signal_loop, daemon=True)
-    t_signal.start()
-from flask import Flask, request, jsonify
-import threading, os, logging
+    # Signal engine stages run in background threads
+    start_engine()
 
-app = Flask(__name__)
-
-@app.route("/")
-def home():
-    return "✅ Lekzy Trade AI is running on Railway!", 200
+    if RUN_MODE == "poll":
+        threading.Thread(target=lambda: app.run(host="0.0.0.0", port=PORT), daemon=True).start()
+        polling_wrapper()
+        return
 
-@app.route("/webhook", methods=["POST"])
-def webhook():
     try:
-        data = request.get_json(force=True)
-        logging.info(f"Webhook received: {data}")
-        return jsonify({"ok": True}), 200
+        if not WEBHOOK_URL:
+            raise RuntimeError("WEBHOOK_URL not set")
+        set_telegram_webhook()
     except Exception as e:
-        logging.error(f"Webhook error: {e}")
-        return jsonify({"error": str(e)}), 400
-
-
-def start_flask():
-    port = int(os.getenv("PORT", 8080))
-    app.run(host="0.0.0.0", port=port)
-
-
-def start_bot():
-    import telebot
-    token = os.getenv("TELEGRAM_TOKEN")
-    bot = telebot.TeleBot(token)
-
-    @bot.message_handler(commands=['start'])
-    def start(msg):
-        bot.reply_to(msg, "🤖 Lekzy Trade AI is online and ready!")
-
-    bot.infinity_polling()
-
+        logger.warning("Telegram webhook unavailable (%s), polling for updates instead", e)
+        threading.Thread(target=polling_wrapper, daemon=True).start()
+    app.run(host="0.0.0.0", port=PORT, threaded=True)
 
 if __name__ == "__main__":
-    flask_thread = threading.Thread(target=start_flask)
-    flask_thread.start()
-
-    start_bot()
+    main()
@@ -0,0 +1,14 @@
+import os
+import sys
+import tempfile
+
+# lekzy_trade_ai reads its configuration at import time
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+_tmp = tempfile.mkdtemp()
+os.environ.setdefault("TELEGRAM_TOKEN", "123:TEST")
+os.environ.setdefault("TWELVE_API_KEY", "test")
+os.environ.setdefault("LOG_DIR", _tmp)
+os.environ.setdefault("DB_FILE", os.path.join(_tmp, "subs.db"))
+os.environ.setdefault("SIGNAL_DB", os.path.join(_tmp, "signals.db"))
+os.environ.setdefault("CANDLE_DIR", "")
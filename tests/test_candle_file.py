@@ -0,0 +1,23 @@
+from core.candle_file import CandleFile, CandleReader, GROW_RECORDS
+
+
+def _bars(start, n):
+    return [(60 * i, 1.0, 2.0, 0.5, float(i), 0.0) for i in range(start, start + n)]
+
+
+def test_reader_views_survive_writer_growth(tmp_path):
+    path = str(tmp_path / "EURUSD.candles")
+    writer = CandleFile(path, 60)
+    writer.write(_bars(0, 10))
+    reader = CandleReader(path)
+    old = reader.columns()
+
+    writer.write(_bars(10, GROW_RECORDS + 5))  # grows the file: the reader remaps
+    assert reader.last_epoch() == 60 * (GROW_RECORDS + 14)
+    new = reader.columns()
+    assert len(old["time"]) == 10 and old["close"][-1] == 9.0
+    assert len(new["time"]) == GROW_RECORDS + 15
+
+    reader.close()
+    writer.close()
+    assert old["close"][3] == 3.0 and new["close"][-1] == GROW_RECORDS + 14
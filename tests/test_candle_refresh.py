@@ -0,0 +1,64 @@
+from datetime import datetime, timezone
+from unittest import mock
+
+import lekzy_trade_ai as L
+
+T = 1_700_000_040  # a candle open
+
+
+class FakeTwelveData:
+    """time_series answers ending at the candle forming at the fake clock."""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.sizes = []
+
+    def values(self, n):
+        candle_open = int(self.clock[0]) // 60 * 60
+        out = []
+        for i in range(n):
+            ep = candle_open - 60 * i
+            dt = datetime.fromtimestamp(ep, timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+            out.append({"datetime": dt, "open": "1", "high": "2", "low": "0.5", "close": "1.5", "volume": "0"})
+        return {"values": out}
+
+    def get(self, url, params, timeout):
+        n = int(params["outputsize"])
+        self.sizes.append(n)
+        symbols = params["symbol"].split(",")
+        data = self.values(n) if len(symbols) == 1 else {sym: self.values(n) for sym in symbols}
+        return mock.Mock(status_code=200, json=lambda: data, raise_for_status=lambda: None)
+
+
+def _run(refresh):
+    clock = [T + 10.0]
+    api = FakeTwelveData(clock)
+    store = L.CandleStore(capacity=600, root="")
+
+    def acquire(credits=1, priority=L.PRIORITY_SCAN):
+        clock[0] += 60  # the credit wait crosses a candle close
+
+    with mock.patch.object(L.time, "time", lambda: clock[0]), \
+            mock.patch.object(L.requests, "get", api.get), \
+            mock.patch.object(L.td_budget, "acquire", acquire):
+        s = store.get_series("EUR/USD", "1min")
+        s.merge({k: v[:3] for k, v in L._parse_values(api.values(3)).items()})  # tail ends at T
+        s.expires_at = 0
+        clock[0] = T + 70  # next candle: two bars missing before the wait
+        refresh(store)
+        return s, api.sizes
+
+
+def test_refresh_sizes_tail_after_credit_wait():
+    s, sizes = _run(lambda store: store.refresh("EUR/USD", "1min", 250))
+    assert sizes == [3]  # T, T+60 and the bar forming at T+120; no reload
+    assert s.last_epoch == T + 120
+    assert len(s) == 5
+
+
+def test_refresh_many_sizes_tail_after_credit_wait():
+    s, sizes = _run(lambda store: store.refresh_many(["EUR/USD", "GBP/USD"], "1min", 250))
+    # GBP/USD is new (full load); EUR/USD's tail is sized after the wait
+    assert sorted(sizes) == [3, 600]
+    assert s.last_epoch == T + 120
+    assert len(s) == 5
@@ -0,0 +1,37 @@
+import threading
+import time
+
+from lekzy_trade_ai import CreditBudget
+
+
+def test_waiter_above_adopted_limit_fails_and_frees_queue():
+    budget = CreditBudget(14)
+    budget.available = 0  # spent for this minute: the next caller has to queue
+    outcome = {}
+
+    def big():
+        try:
+            budget.acquire(14)
+            outcome["big"] = "acquired"
+        except ValueError:
+            outcome["big"] = "ValueError"
+
+    t = threading.Thread(target=big, daemon=True)
+    t.start()
+    deadline = time.time() + 2
+    while not budget.waiting and time.time() < deadline:
+        time.sleep(0.01)
+    assert budget.waiting
+
+    budget.backoff("You have run out of API credits for the current minute, current limit being 8")
+    t.join(2)
+    assert outcome.get("big") == "ValueError"
+    assert budget.limit == 8
+    assert budget.waiting == []
+
+    # next minute: later callers are served, nothing is left blocking the head
+    budget.blocked_until = 0
+    budget.minute -= 1
+    done = threading.Event()
+    threading.Thread(target=lambda: (budget.acquire(1), done.set()), daemon=True).start()
+    assert done.wait(2)